@@ -0,0 +1,111 @@
+"""partition access logs by month
+
+Revision ID: 03bd10ddbef4
+Revises: 63f3e215646a
+Create Date: 2026-10-17 15:40:12.804417
+
+"""
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '03bd10ddbef4'
+down_revision = '63f3e215646a'
+branch_labels = None
+depends_on = None
+
+# Keep in sync with settings.ACCESS_LOG_PARTITIONS_AHEAD; the sweeper
+# creates any later months
+PARTITIONS_AHEAD = 3
+BATCH_SIZE = 5000
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def copy_in_batches(source: str, accessed_at: str) -> None:
+    """Copy source into access_logs by id in short, separately committed batches"""
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        after = ""
+        while True:
+            after = conn.execute(sa.text(f"""
+                WITH batch AS (
+                    SELECT id, secret_id, ip_address, user_agent, {accessed_at} AS accessed_at
+                    FROM {source}
+                    WHERE id > :after
+                    ORDER BY id
+                    LIMIT :batch_size
+                ), copied AS (
+                    INSERT INTO access_logs (id, secret_id, ip_address, user_agent, accessed_at)
+                    SELECT id, secret_id, ip_address, user_agent, accessed_at FROM batch
+                )
+                SELECT max(id) FROM batch
+            """), {"after": after, "batch_size": BATCH_SIZE}).scalar()
+            if after is None:
+                break
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    op.execute("ALTER TABLE access_logs RENAME TO access_logs_unpartitioned")
+    op.execute("ALTER TABLE access_logs_unpartitioned RENAME CONSTRAINT access_logs_pkey TO access_logs_unpartitioned_pkey")
+    op.drop_index('ix_access_logs_secret_id', table_name='access_logs_unpartitioned')
+    op.drop_index('ix_access_logs_accessed_at', table_name='access_logs_unpartitioned')
+
+    # The partition key must be part of the primary key, and can't be NULL
+    op.create_table('access_logs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('secret_id', sa.String(), nullable=False),
+    sa.Column('ip_address', sa.String(), nullable=False),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['secret_id'], ['secrets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'accessed_at'),
+    postgresql_partition_by='RANGE (accessed_at)'
+    )
+    op.create_index(op.f('ix_access_logs_accessed_at'), 'access_logs', ['accessed_at'], unique=False)
+    op.create_index(op.f('ix_access_logs_secret_id'), 'access_logs', ['secret_id'], unique=False)
+
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    oldest = conn.execute(sa.text("SELECT min(accessed_at) FROM access_logs_unpartitioned")).scalar()
+    month = min(oldest.date().replace(day=1), current) if oldest else current
+    while month <= add_months(current, PARTITIONS_AHEAD):
+        op.execute(
+            f"CREATE TABLE access_logs_{month.year:04d}_{month.month:02d} PARTITION OF access_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        month = add_months(month, 1)
+
+    # New logs already go to the partitioned table; old ones follow in
+    # batches so no single transaction holds locks for the whole copy
+    copy_in_batches('access_logs_unpartitioned', 'COALESCE(accessed_at, now())')
+    op.drop_table('access_logs_unpartitioned')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE access_logs RENAME TO access_logs_partitioned")
+    op.execute("ALTER TABLE access_logs_partitioned RENAME CONSTRAINT access_logs_pkey TO access_logs_partitioned_pkey")
+    op.drop_index('ix_access_logs_secret_id', table_name='access_logs_partitioned')
+    op.drop_index('ix_access_logs_accessed_at', table_name='access_logs_partitioned')
+
+    op.create_table('access_logs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('secret_id', sa.String(), nullable=False),
+    sa.Column('ip_address', sa.String(), nullable=False),
+    sa.Column('user_agent', sa.String(), nullable=True),
+    sa.Column('accessed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['secret_id'], ['secrets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    copy_in_batches('access_logs_partitioned', 'accessed_at')
+    op.create_index(op.f('ix_access_logs_accessed_at'), 'access_logs', ['accessed_at'], unique=False)
+    op.create_index(op.f('ix_access_logs_secret_id'), 'access_logs', ['secret_id'], unique=False)
+
+    # Dropping the parent drops all of its partitions
+    op.drop_table('access_logs_partitioned')
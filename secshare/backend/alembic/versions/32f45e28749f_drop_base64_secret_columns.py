@@ -0,0 +1,89 @@
+"""drop base64 secret columns
+
+Revision ID: 32f45e28749f
+Revises: 8c4f7d2e1a60
+Create Date: 2026-10-18 09:12:40.371052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '32f45e28749f'
+down_revision = '8c4f7d2e1a60'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+BIN_COLUMNS = ('encrypted_content_bin', 'encrypted_key_bin', 'iv_bin')
+
+
+def upgrade() -> None:
+    # Contract step of 54eb91d208da. Deploy it only once every instance runs
+    # a release that reads the binary columns. Rows inserted by older
+    # instances after the expand backfill only have base64, so convert them
+    # first. Rows locked by a writer are waited for, not skipped: anything
+    # left unconverted would lose its ciphertext with the drop below.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        while True:
+            result = conn.execute(sa.text("""
+                UPDATE secrets
+                SET encrypted_content_bin = COALESCE(encrypted_content_bin, decode(encrypted_content, 'base64')),
+                    encrypted_key_bin = COALESCE(encrypted_key_bin, decode(encrypted_key, 'base64')),
+                    iv_bin = COALESCE(iv_bin, decode(iv, 'base64'))
+                WHERE id IN (
+                    SELECT id FROM secrets
+                    WHERE (encrypted_content_bin IS NULL AND encrypted_content IS NOT NULL)
+                       OR (encrypted_key_bin IS NULL AND encrypted_key IS NOT NULL)
+                       OR (iv_bin IS NULL AND iv IS NOT NULL)
+                    LIMIT :batch_size
+                    FOR UPDATE
+                )
+            """), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+    missing = op.get_bind().execute(sa.text(
+        "SELECT count(*) FROM secrets WHERE "
+        + " OR ".join(f"{column} IS NULL" for column in BIN_COLUMNS)
+    )).scalar()
+    if missing:
+        raise RuntimeError(
+            f"{missing} secrets have no binary ciphertext; not dropping the base64 columns"
+        )
+
+    op.drop_column('secrets', 'iv')
+    op.drop_column('secrets', 'encrypted_key')
+    op.drop_column('secrets', 'encrypted_content')
+    for column in BIN_COLUMNS:
+        op.alter_column('secrets', column, existing_type=sa.LargeBinary(), nullable=False)
+
+
+def downgrade() -> None:
+    for column in BIN_COLUMNS:
+        op.alter_column('secrets', column, existing_type=sa.LargeBinary(), nullable=True)
+    op.add_column('secrets', sa.Column('encrypted_content', sa.Text(), nullable=True))
+    op.add_column('secrets', sa.Column('encrypted_key', sa.String(), nullable=True))
+    op.add_column('secrets', sa.Column('iv', sa.String(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        while True:
+            result = conn.execute(sa.text("""
+                UPDATE secrets
+                SET encrypted_content = encode(encrypted_content_bin, 'base64'),
+                    encrypted_key = encode(encrypted_key_bin, 'base64'),
+                    iv = encode(iv_bin, 'base64')
+                WHERE id IN (
+                    SELECT id FROM secrets
+                    WHERE encrypted_content IS NULL AND encrypted_content_bin IS NOT NULL
+                    LIMIT :batch_size
+                    FOR UPDATE
+                )
+            """), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
@@ -0,0 +1,45 @@
+"""stripe event retry backoff
+
+Revision ID: 420c221a08bf
+Revises: b4305133e901
+Create Date: 2026-10-18 12:02:19.417305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '420c221a08bf'
+down_revision = 'b4305133e901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('stripe_events', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('stripe_events', sa.Column('failed_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Events given up on used to be marked processed with their error kept
+    op.execute(
+        "UPDATE stripe_events SET failed_at = processed_at, processed_at = NULL "
+        "WHERE processed_at IS NOT NULL AND last_error IS NOT NULL"
+    )
+
+    op.drop_index('ix_stripe_events_pending_created', table_name='stripe_events')
+    op.create_index(
+        'ix_stripe_events_pending_created', 'stripe_events', ['created'], unique=False,
+        postgresql_where=sa.text('processed_at IS NULL AND failed_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stripe_events_pending_created', table_name='stripe_events')
+    op.create_index(
+        'ix_stripe_events_pending_created', 'stripe_events', ['created'], unique=False,
+        postgresql_where=sa.text('processed_at IS NULL')
+    )
+
+    op.execute("UPDATE stripe_events SET processed_at = failed_at WHERE failed_at IS NOT NULL")
+    op.drop_column('stripe_events', 'failed_at')
+    op.drop_column('stripe_events', 'next_attempt_at')
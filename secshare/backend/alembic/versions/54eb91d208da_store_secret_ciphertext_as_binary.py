@@ -0,0 +1,77 @@
+"""store secret ciphertext as binary
+
+Revision ID: 54eb91d208da
+Revises: 9d4705b539a7
+Create Date: 2026-10-17 10:02:47.915630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '54eb91d208da'
+down_revision = '9d4705b539a7'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.add_column('secrets', sa.Column('encrypted_content_bin', sa.LargeBinary(), nullable=True))
+    op.add_column('secrets', sa.Column('encrypted_key_bin', sa.LargeBinary(), nullable=True))
+    op.add_column('secrets', sa.Column('iv_bin', sa.LargeBinary(), nullable=True))
+    op.alter_column('secrets', 'encrypted_content', existing_type=sa.Text(), nullable=True)
+    op.alter_column('secrets', 'encrypted_key', existing_type=sa.String(), nullable=True)
+    op.alter_column('secrets', 'iv', existing_type=sa.String(), nullable=True)
+
+    # Expand only: the base64 columns keep their values, and the app keeps
+    # writing both formats, so instances still on the previous release read
+    # every row during a rolling deploy. A later contract migration drops
+    # them. Existing rows are converted in short, separately committed
+    # batches so the table is never locked for the whole backfill.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        while True:
+            result = conn.execute(sa.text("""
+                UPDATE secrets
+                SET encrypted_content_bin = COALESCE(encrypted_content_bin, decode(encrypted_content, 'base64')),
+                    encrypted_key_bin = COALESCE(encrypted_key_bin, decode(encrypted_key, 'base64')),
+                    iv_bin = COALESCE(iv_bin, decode(iv, 'base64'))
+                WHERE id IN (
+                    SELECT id FROM secrets
+                    WHERE encrypted_content_bin IS NULL AND encrypted_content IS NOT NULL
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+            """), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        while True:
+            result = conn.execute(sa.text("""
+                UPDATE secrets
+                SET encrypted_content = COALESCE(encrypted_content, encode(encrypted_content_bin, 'base64')),
+                    encrypted_key = COALESCE(encrypted_key, encode(encrypted_key_bin, 'base64')),
+                    iv = COALESCE(iv, encode(iv_bin, 'base64'))
+                WHERE id IN (
+                    SELECT id FROM secrets
+                    WHERE encrypted_content IS NULL AND encrypted_content_bin IS NOT NULL
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+            """), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+    op.alter_column('secrets', 'iv', existing_type=sa.String(), nullable=False)
+    op.alter_column('secrets', 'encrypted_key', existing_type=sa.String(), nullable=False)
+    op.alter_column('secrets', 'encrypted_content', existing_type=sa.Text(), nullable=False)
+    op.drop_column('secrets', 'iv_bin')
+    op.drop_column('secrets', 'encrypted_key_bin')
+    op.drop_column('secrets', 'encrypted_content_bin')
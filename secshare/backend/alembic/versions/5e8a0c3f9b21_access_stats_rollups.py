@@ -0,0 +1,70 @@
+"""access stats rollups
+
+Revision ID: 5e8a0c3f9b21
+Revises: b71c2e9a4d05
+Create Date: 2026-10-17 19:10:27.554019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a0c3f9b21'
+down_revision = 'b71c2e9a4d05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('secret_access_hourly',
+    sa.Column('secret_id', sa.String(), nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['secret_id'], ['secrets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('secret_id', 'hour')
+    )
+    op.create_index(op.f('ix_secret_access_hourly_hour'), 'secret_access_hourly', ['hour'], unique=False)
+    op.create_table('secret_access_ips',
+    sa.Column('secret_id', sa.String(), nullable=False),
+    sa.Column('ip_address', sa.String(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['secret_id'], ['secrets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('secret_id', 'ip_address')
+    )
+    op.create_table('secret_access_agents',
+    sa.Column('secret_id', sa.String(), nullable=False),
+    sa.Column('user_agent', sa.String(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['secret_id'], ['secrets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('secret_id', 'user_agent')
+    )
+
+    # Backfill from the logs still retained; from here on the statements
+    # that write access_logs keep the rollups current
+    op.execute("""
+        INSERT INTO secret_access_hourly (secret_id, hour, views)
+        SELECT secret_id, date_trunc('hour', accessed_at, 'UTC') AS hour, count(*)
+        FROM access_logs
+        GROUP BY secret_id, hour
+    """)
+    op.execute("""
+        INSERT INTO secret_access_ips (secret_id, ip_address, views, last_accessed_at)
+        SELECT secret_id, ip_address, count(*), max(accessed_at)
+        FROM access_logs
+        GROUP BY secret_id, ip_address
+    """)
+    op.execute("""
+        INSERT INTO secret_access_agents (secret_id, user_agent, views)
+        SELECT secret_id, left(coalesce(user_agent, ''), 256) AS agent, count(*)
+        FROM access_logs
+        GROUP BY secret_id, agent
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('secret_access_agents')
+    op.drop_table('secret_access_ips')
+    op.drop_index(op.f('ix_secret_access_hourly_hour'), table_name='secret_access_hourly')
+    op.drop_table('secret_access_hourly')
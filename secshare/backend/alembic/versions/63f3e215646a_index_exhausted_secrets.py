@@ -0,0 +1,34 @@
+"""index exhausted secrets
+
+Revision ID: 63f3e215646a
+Revises: 54eb91d208da
+Create Date: 2026-10-17 14:21:05.310482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '63f3e215646a'
+down_revision = '54eb91d208da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so secrets stays writable while the index is created
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_secrets_exhausted_updated_at', 'secrets', ['updated_at'], unique=False,
+            postgresql_where=sa.text('current_views >= max_views'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_secrets_exhausted_updated_at', table_name='secrets',
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,46 @@
+"""stripe event inbox
+
+Revision ID: 8c4f7d2e1a60
+Revises: 5e8a0c3f9b21
+Create Date: 2026-10-17 21:34:12.803516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f7d2e1a60'
+down_revision = '5e8a0c3f9b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stripe_events',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('subscription_key', sa.String(), nullable=False),
+    sa.Column('created', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_stripe_events_pending_created', 'stripe_events', ['created'], unique=False,
+        postgresql_where=sa.text('processed_at IS NULL')
+    )
+    op.create_index(
+        'ix_stripe_events_subscription_key_created', 'stripe_events',
+        ['subscription_key', 'created'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stripe_events_subscription_key_created', table_name='stripe_events')
+    op.drop_index('ix_stripe_events_pending_created', table_name='stripe_events')
+    op.drop_table('stripe_events')
@@ -0,0 +1,25 @@
+"""add secret key version
+
+Revision ID: 9d4705b539a7
+Revises: 4eefbdbe3f29
+Create Date: 2026-10-17 09:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4705b539a7'
+down_revision = '4eefbdbe3f29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing wrapped keys were all derived from SECRET_KEY, which is version 1
+    op.add_column('secrets', sa.Column('key_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('secrets', 'key_version')
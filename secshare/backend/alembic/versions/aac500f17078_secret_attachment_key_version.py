@@ -0,0 +1,25 @@
+"""secret attachment key version
+
+Revision ID: aac500f17078
+Revises: 32f45e28749f
+Create Date: 2026-10-18 10:41:05.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aac500f17078'
+down_revision = '32f45e28749f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Left NULL for existing attachments; the re-wrap job reads their headers
+    op.add_column('secrets', sa.Column('attachment_key_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('secrets', 'attachment_key_version')
@@ -0,0 +1,26 @@
+"""access logs default partition
+
+Revision ID: b4305133e901
+Revises: aac500f17078
+Create Date: 2026-10-18 11:20:37.640918
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4305133e901'
+down_revision = 'aac500f17078'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Catches rows for months whose partition doesn't exist yet (e.g. the
+    # sweeper stopped over a month boundary) so inserts, and with them secret
+    # views, keep working. maintain() moves them into their month's partition.
+    op.execute("CREATE TABLE access_logs_default PARTITION OF access_logs DEFAULT")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE access_logs_default")
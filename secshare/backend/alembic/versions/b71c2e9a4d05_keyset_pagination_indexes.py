@@ -0,0 +1,49 @@
+"""keyset pagination indexes
+
+Revision ID: b71c2e9a4d05
+Revises: 03bd10ddbef4
+Create Date: 2026-10-17 18:02:41.127305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71c2e9a4d05'
+down_revision = '03bd10ddbef4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The composite indexes lead with the old single-column ones, so those go
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_secrets_created_by_id_created_at', 'secrets',
+            ['created_by_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False,
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_secrets_created_by_id', table_name='secrets', postgresql_concurrently=True)
+
+    # Postgres can't build an index on a partitioned table concurrently
+    op.create_index(
+        'ix_access_logs_secret_id_accessed_at', 'access_logs',
+        ['secret_id', sa.text('accessed_at DESC'), sa.text('id DESC')], unique=False
+    )
+    op.drop_index('ix_access_logs_secret_id', table_name='access_logs')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_access_logs_secret_id'), 'access_logs', ['secret_id'], unique=False)
+    op.drop_index('ix_access_logs_secret_id_accessed_at', table_name='access_logs')
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_secrets_created_by_id'), 'secrets', ['created_by_id'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_secrets_created_by_id_created_at', table_name='secrets',
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,33 @@
+"""stripe event applied flag
+
+Revision ID: c73a37096a0b
+Revises: 420c221a08bf
+Create Date: 2026-10-18 12:41:07.582914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c73a37096a0b'
+down_revision = '420c221a08bf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'stripe_events',
+        sa.Column('applied', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+    )
+    # Whether earlier events changed anything wasn't recorded; keep treating
+    # the successful ones as applied, as before
+    op.execute(
+        "UPDATE stripe_events SET applied = true "
+        "WHERE processed_at IS NOT NULL AND last_error IS NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('stripe_events', 'applied')
@@ -1,18 +1,172 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+import redis
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.base import get_db
+from app.db.base import get_async_db, get_db
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.rate_limit import TokenBucketLimiter
+from app.core.redis import async_redis_client, redis_client
+from app.core.response_cache import ResponseCache
 from app.core.security import decode_access_token
 from app.models.user import User
+from app.models.subscription import Subscription, SubscriptionPlan
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
+metrics_security = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot of the authenticated user that endpoints can use without a DB hit"""
+    id: str
+    team_id: Optional[str]
+    plan: SubscriptionPlan
+    claims: dict
+
+
+# Keyed by bearer token and tagged by user id; entries are (principal,
+# generation). The cache is per process, so invalidate_principal also bumps
+# the user's generation in Redis, and a hit whose generation no longer
+# matches is reloaded. That covers other API workers and the jobs.
+principal_cache = TTLCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+rate_limiter = TokenBucketLimiter(async_redis_client, settings.RATE_LIMITS)
+
+# Shared across workers through Redis; entries are dropped by invalidate_principal
+response_cache = ResponseCache(
+    redis_client,
+    async_redis_client,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
+
+
+def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_security)
+) -> None:
+    """Only let monitoring that presents METRICS_TOKEN read internal stats"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def client_ip(request: Request) -> str:
+    """Address of the client, as seen by the outermost trusted proxy"""
+    if settings.TRUSTED_PROXY_COUNT > 0:
+        # Entries left of the ones our proxies appended are client-controlled
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= settings.TRUSTED_PROXY_COUNT:
+            return hops[-settings.TRUSTED_PROXY_COUNT]
+    return request.client.host
+
+
+def rate_limit(route: str):
+    """Dependency that takes a token from the route's per-IP and global buckets"""
+    async def check(request: Request) -> None:
+        if settings.RATE_LIMIT_ENABLED:
+            await rate_limiter.check(route, client_ip(request))
+    return check
+
+
+def principal_generation_key(user_id: str) -> str:
+    return f"principal:{user_id}:gen"
+
+
+def bump_principal_generation(client, user_id: str):
+    """Give the user a generation no cached principal holds; awaitable on the async client"""
+    # A random value rather than a counter: after the key expires a counter
+    # restarts and can repeat a generation a cached entry still holds
+    return client.set(
+        principal_generation_key(user_id), uuid.uuid4().hex, ex=settings.PRINCIPAL_CACHE_TTL_SECONDS
+    )
+
+
+async def principal_generation(user_id: str) -> Optional[str]:
+    """The user's current generation, or None if Redis can't say"""
+    try:
+        return await async_redis_client.get(principal_generation_key(user_id)) or ""
+    except redis.RedisError:
+        logger.warning("Principal generation unavailable, trusting cached principals", exc_info=True)
+        return None
+
+
+def invalidate_principal(user_id: Optional[str]) -> None:
+    """Drop cached principals and responses after a user's team or subscription changes"""
+    if user_id:
+        principal_cache.invalidate_tag(user_id)
+        try:
+            bump_principal_generation(redis_client, user_id)
+        except redis.RedisError:
+            logger.exception("Could not invalidate cached principals for user %s", user_id)
+        response_cache.invalidate(user_id)
+
+
+async def invalidate_principal_async(user_id: Optional[str]) -> None:
+    """invalidate_principal() for async endpoints, without blocking the event loop on Redis"""
+    if user_id:
+        principal_cache.invalidate_tag(user_id)
+        try:
+            await bump_principal_generation(async_redis_client, user_id)
+        except redis.RedisError:
+            logger.exception("Could not invalidate cached principals for user %s", user_id)
+        await response_cache.invalidate_async(user_id)
+
+
+async def load_principal(db: AsyncSession, user_id: str, claims: dict) -> Optional[Principal]:
+    result = await db.execute(
+        select(User.id, User.team_id, Subscription.plan).outerjoin(
+            Subscription, Subscription.user_id == User.id
+        ).where(User.id == user_id)
+    )
+    row = result.first()
+
+    if row is None:
+        return None
+
+    return Principal(
+        id=row.id,
+        team_id=row.team_id,
+        plan=row.plan or SubscriptionPlan.FREE,
+        claims=claims
+    )
+
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        principal, generation = cached
+        current = await principal_generation(principal.id)
+        if current is None or current == generation:
+            return principal
+
     payload = decode_access_token(token)
 
     if payload is None:
@@ -28,8 +182,31 @@ async def get_current_user(
             detail="Invalid authentication credentials"
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # Read before loading, so an invalidation racing the load isn't missed
+    generation = await principal_generation(user_id)
+    principal = await load_principal(db, user_id, payload)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    # Never serve a cached principal past the token's own expiry
+    ttl = None
+    if "exp" in payload:
+        ttl = payload["exp"] - datetime.now(timezone.utc).timestamp()
+    principal_cache.set(token, (principal, generation or ""), ttl_seconds=ttl, tags=(principal.id,))
+
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+) -> User:
+    user = await run_in_threadpool(db.get, User, principal.id)
     if user is None:
+        await invalidate_principal_async(principal.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
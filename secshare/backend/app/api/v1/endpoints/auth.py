@@ -1,35 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime, timezone
 import secrets
-from app.db.base import get_db
+from app.db.base import get_async_db, get_db
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
 from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus
 from app.models.usage_stats import UsageStats
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import get_password_hash_async, verify_password_async, create_access_token
 from app.core.config import settings
-from app.api.deps import get_current_user
+from app.api.deps import Principal, get_current_principal, invalidate_principal, response_cache
 
 router = APIRouter()
 
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_in.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
+
 
-    # Create user
+async def create_user(db: AsyncSession, user_in: UserCreate, password_hash: str) -> User:
     user = User(
         id=secrets.token_urlsafe(16),
         email=user_in.email,
         name=user_in.name,
-        password_hash=get_password_hash(user_in.password)
+        password_hash=password_hash
     )
     db.add(user)
 
@@ -52,17 +49,39 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(usage)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 
-@router.post("/login", response_model=Token)
-def login(user_in: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_in.email).first()
+# register and login hash passwords on the dedicated password pool and use
+# the async session, so they never hold a request threadpool slot
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Check if user already exists
+    existing_user = await get_user_by_email(db, user_in.email)
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
+    password_hash = await get_password_hash_async(user_in.password)
+
+    return await create_user(db, user_in, password_hash)
+
 
-    if not user or not verify_password(user_in.password, user.password_hash):
+@router.post("/login", response_model=Token, response_model_exclude_none=True)
+async def login(
+    user_in: UserLogin,
+    include_user: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """include_user=true returns the profile with the token, saving a GET /auth/me"""
+    user = await get_user_by_email(db, user_in.email)
+
+    if not user or not await verify_password_async(user_in.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -73,9 +92,27 @@ def login(user_in: UserLogin, db: Session = Depends(get_db)):
         data={"sub": user.id}, expires_delta=access_token_expires
     )
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user if include_user else None
+    }
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
-    return current_user
+def get_me(
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    def build():
+        user = db.get(User, current_user.id)
+        if user is None:
+            invalidate_principal(current_user.id)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        return UserResponse.model_validate(user)
+
+    return response_cache.respond(request, current_user.id, "auth_me", build)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.base import get_async_db
+from app.db.secret_list import list_live_secrets
+from app.db.usage import get_usage_counts_async
+from app.schemas.dashboard import DashboardResponse
+from app.models.user import User
+from app.models.subscription import Subscription, SubscriptionPlan
+from app.core.config import settings
+from app.core.plans import plan_limits
+from app.api.deps import Principal, get_current_principal, invalidate_principal_async
+
+router = APIRouter()
+
+
+@router.get("", response_model=DashboardResponse)
+async def get_dashboard(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Everything the dashboard shows, in one request: two queries and one Redis read"""
+    result = await db.execute(
+        select(User, Subscription).outerjoin(
+            Subscription, Subscription.user_id == User.id
+        ).where(User.id == current_user.id)
+    )
+    row = result.first()
+
+    if row is None:
+        await invalidate_principal_async(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    user, subscription = row
+    limits = plan_limits(subscription.plan if subscription else SubscriptionPlan.FREE)
+    usage = await get_usage_counts_async(db, user.id)
+    secrets, next_cursor = await list_live_secrets(db, user.id, limit)
+
+    return {
+        "user": user,
+        "subscription": subscription,
+        "usage": {
+            **usage,
+            "limit_secrets": limits.secrets_per_month,
+            "limit_attachments": limits.max_attachment_size,
+            "limit_team_size": limits.team_size
+        },
+        "secrets": secrets,
+        "next_cursor": next_cursor
+    }
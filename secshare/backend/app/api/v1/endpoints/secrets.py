@@ -1,83 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 import secrets as secrets_module
-import base64
-from typing import List
-from app.db.base import get_db
-from app.schemas.secret import SecretCreate, SecretResponse, SecretView
+from typing import List, Optional, Tuple
+from app.db.access_logs import access_log_buffer
+from app.db.access_stats import get_access_stats, rollup_ctes
+from app.db.base import get_async_db, get_db
+from app.db.secret_list import list_live_secrets
+from app.db.usage import get_usage_counts, increment_usage, increment_usage_async
+from app.schemas.secret import (
+    AccessStats,
+    SecretBatchCreate,
+    SecretCreate,
+    SecretDeleteResult,
+    SecretDeleteScope,
+    SecretResponse,
+    SecretView,
+)
 from app.models.secret import Secret
 from app.models.access_log import AccessLog
-from app.models.user import User
-from app.models.usage_stats import UsageStats
-from app.core.security import SecretEncryption
+from app.core.security import (
+    SecretEncryption,
+    AttachmentEncryptor,
+    AttachmentHeader,
+    attachment_range,
+    create_access_token,
+    decode_access_token,
+    decrypt_attachment,
+    decrypt_attachment_range,
+)
 from app.core.config import settings
-from app.api.deps import get_current_user
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.core.plans import plan_limits
+from app.core.storage import blob_store
+from app.core.uploads import MultipartFileStream
+from app.api.deps import Principal, client_ip, get_current_principal, rate_limit
 
 router = APIRouter()
 
 
-def check_usage_limits(db: Session, user: User):
-    """Check if user has exceeded their monthly secret limit"""
-    usage = db.query(UsageStats).filter(UsageStats.user_id == user.id).first()
-
-    if not usage:
-        return True
-
-    # Get subscription limits
-    subscription = user.subscription
-    is_free_plan = not subscription or subscription.plan.value == "FREE"
-
-    if not subscription:
-        limit = settings.FREE_SECRETS_PER_MONTH
-    elif subscription.plan.value == "FREE":
-        limit = settings.FREE_SECRETS_PER_MONTH
-    elif subscription.plan.value == "PRO":
-        limit = settings.PRO_SECRETS_PER_MONTH
-    elif subscription.plan.value == "TEAM":
-        limit = settings.TEAM_SECRETS_PER_MONTH
-    else:
-        limit = 9999999  # Enterprise
-
-    # Reset usage on 1st of month (only for free plan)
-    if is_free_plan:
-        now = datetime.now(timezone.utc)
-        if now >= usage.period_end:
-            # Calculate new period (1st of current month to 1st of next month)
-            period_start = datetime(now.year, now.month, 1, 0, 0, 0, tzinfo=timezone.utc)
-
-            # Calculate first day of next month
-            if now.month == 12:
-                period_end = datetime(now.year + 1, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
-            else:
-                period_end = datetime(now.year, now.month + 1, 1, 0, 0, 0, tzinfo=timezone.utc)
-
-            # Reset counters
-            usage.secrets_created_this_month = 0
-            usage.secret_requests_this_month = 0
-            usage.attachment_bytes_this_month = 0
-            usage.period_start = period_start
-            usage.period_end = period_end
-            db.commit()
-
-    if usage.secrets_created_this_month >= limit:
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def check_usage_limits(db: Session, user: Principal, count: int = 1):
+    """Check if creating `count` more secrets would exceed the user's monthly limit"""
+    created = get_usage_counts(db, user.id)["secrets_created_this_month"]
+    limit = plan_limits(user.plan).secrets_per_month
+
+    if created >= limit:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Monthly secret limit reached ({limit}). Upgrade your plan."
         )
 
+    if created + count > limit:
+        remaining = limit - created
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Creating {count} secrets would exceed your monthly limit ({remaining} of {limit} left). Upgrade your plan."
+        )
+
     return True
 
 
-@router.post("", response_model=SecretResponse, status_code=status.HTTP_201_CREATED)
-def create_secret(
-    secret_in: SecretCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Check usage limits
-    check_usage_limits(db, current_user)
+def delete_attachment_blobs(blob_keys: List[Optional[str]]) -> None:
+    """Delete the blobs of secrets already deleted from the database"""
+    for key in blob_keys:
+        if key:
+            blob_store.delete(key)
+
 
+def attachment_download_url(secret: Secret) -> Optional[str]:
+    """Short-lived link handed out with a successful view"""
+    if not secret.has_attachment:
+        return None
+
+    token = create_access_token(
+        data={"sub": secret.id, "scope": "attachment"},
+        expires_delta=timedelta(minutes=settings.ATTACHMENT_LINK_EXPIRE_MINUTES)
+    )
+    return f"{settings.API_V1_STR}/secrets/{secret.id}/attachment?token={token}"
+
+
+def encrypt_secret(secret_in: SecretCreate, user_id: str, team_id: Optional[str], now: datetime) -> dict:
+    """Column values for a new secret, with its content encrypted under a fresh data key"""
     # Generate encryption key and IV
     key = SecretEncryption.generate_key()
     iv = SecretEncryption.generate_iv()
@@ -86,101 +106,222 @@ def create_secret(
     encrypted_content = SecretEncryption.encrypt(secret_in.content, key, iv)
 
     # Encrypt the key itself with master key
-    encrypted_key = SecretEncryption.encrypt_key(key, settings.SECRET_KEY)
-
-    # Calculate expiration
-    expires_at = datetime.now(timezone.utc) + timedelta(hours=secret_in.expires_in_hours)
-
-    # Create secret
-    secret = Secret(
-        id=secrets_module.token_urlsafe(16),
-        encrypted_content=base64.b64encode(encrypted_content).decode(),
-        encrypted_key=base64.b64encode(encrypted_key).decode(),
-        iv=base64.b64encode(iv).decode(),
-        max_views=secret_in.max_views,
-        expires_at=expires_at,
-        created_by_id=current_user.id,
-        team_id=current_user.team_id
-    )
+    encrypted_key, key_version = SecretEncryption.encrypt_key(key)
 
-    db.add(secret)
+    return {
+        "id": secrets_module.token_urlsafe(16),
+        "encrypted_content_bin": encrypted_content,
+        "encrypted_key_bin": encrypted_key,
+        "key_version": key_version,
+        "iv_bin": iv,
+        "max_views": secret_in.max_views,
+        "expires_at": now + timedelta(hours=secret_in.expires_in_hours),
+        "current_views": 0,
+        "has_attachment": False,
+        "created_by_id": user_id,
+        "team_id": team_id
+    }
+
+
+@router.post("", response_model=SecretResponse, status_code=status.HTTP_201_CREATED)
+def create_secret(
+    secret_in: SecretCreate,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    # Check usage limits
+    check_usage_limits(db, current_user)
 
-    # Update usage stats
-    usage = db.query(UsageStats).filter(UsageStats.user_id == current_user.id).first()
-    if usage:
-        usage.secrets_created_this_month += 1
+    secret = Secret(**encrypt_secret(
+        secret_in, current_user.id, current_user.team_id, datetime.now(timezone.utc)
+    ))
 
+    db.add(secret)
     db.commit()
     db.refresh(secret)
 
+    increment_usage(db, current_user.id, secrets_created_this_month=1)
+
     return secret
 
 
-@router.get("/{secret_id}", response_model=SecretView)
-def get_secret(
-    secret_id: str,
-    request: Request,
+@router.post("/batch", response_model=List[SecretResponse], status_code=status.HTTP_201_CREATED)
+def create_secrets_batch(
+    batch_in: SecretBatchCreate,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    secret = db.query(Secret).filter(Secret.id == secret_id).first()
-
-    if not secret:
+    """Create many secrets at once.
+
+    The batch is all-or-nothing: the quota is checked once for the whole
+    batch, every row is inserted in a single transaction, and the response
+    lists the created secrets in request order. If anything fails, nothing
+    is created and no usage is counted.
+    """
+    count = len(batch_in.items)
+    if count > settings.SECRET_BATCH_MAX_ITEMS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Secret not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.SECRET_BATCH_MAX_ITEMS} secrets"
         )
 
-    # Check if expired
-    if secret.expires_at < datetime.now(timezone.utc):
-        db.delete(secret)
-        db.commit()
-        raise HTTPException(
-            status_code=status.HTTP_410_GONE,
-            detail="Secret has expired"
+    check_usage_limits(db, current_user, count)
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        encrypt_secret(item, current_user.id, current_user.team_id, now)
+        for item in batch_in.items
+    ]
+
+    # One multi-row INSERT ... RETURNING, results kept in parameter order
+    created = db.execute(
+        insert(Secret).returning(
+            Secret.id,
+            Secret.max_views,
+            Secret.current_views,
+            Secret.expires_at,
+            Secret.has_attachment,
+            Secret.attachment_name,
+            Secret.created_at,
+            sort_by_parameter_order=True
+        ),
+        rows
+    ).all()
+
+    db.commit()
+
+    increment_usage(db, current_user.id, secrets_created_this_month=count)
+
+    return created
+
+
+# Everything the view response needs, returned by the counting UPDATE
+CONSUMED_COLUMNS = (
+    Secret.id,
+    Secret.created_by_id,
+    Secret.encrypted_content_bin,
+    Secret.encrypted_key_bin,
+    Secret.iv_bin,
+    Secret.key_version,
+    Secret.current_views,
+    Secret.max_views,
+    Secret.expires_at,
+    Secret.has_attachment,
+    Secret.attachment_name,
+)
+
+
+def consume_view_statement(secret_id: str, ip_address: str, user_agent: Optional[str], log_access: bool = True):
+    """Count one view and log it in a single statement.
+
+    The view is only counted while the secret is unexpired and has views left,
+    so concurrent viewers can never exceed max_views. No row comes back when
+    the secret is missing, expired or used up. The view is also added to the
+    access stats rollups. With log_access=False the caller records the
+    AccessLog (and its rollups) itself.
+    """
+    consumed = (
+        update(Secret)
+        .where(
+            Secret.id == secret_id,
+            Secret.current_views < Secret.max_views,
+            Secret.expires_at > func.now()
+        )
+        .values(current_views=Secret.current_views + 1)
+        .returning(*CONSUMED_COLUMNS)
+        .cte("consumed")
+    )
+    if not log_access:
+        return select(consumed)
+
+    event = select(
+        literal(secrets_module.token_urlsafe(16)).label("id"),
+        consumed.c.id.label("secret_id"),
+        literal(ip_address).label("ip_address"),
+        literal(user_agent, String).label("user_agent"),
+        func.now().label("accessed_at")
+    ).cte("event")
+    logged = insert(AccessLog).from_select(
+        ["id", "secret_id", "ip_address", "user_agent", "accessed_at"],
+        select(event)
+    ).cte("logged")
+    return select(consumed).add_cte(logged, *rollup_ctes(event))
+
+
+# Declared before /{secret_id} so "stats" isn't taken for a secret id
+@router.get("/stats", response_model=AccessStats)
+async def get_my_access_stats(
+    hours: int = Query(48, ge=1, le=720),
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Access stats summed over all of the caller's secrets"""
+    owned = select(Secret.id).where(Secret.created_by_id == current_user.id)
+    return await get_access_stats(db, owned, hours, days)
+
+
+# Unauthenticated, so throttled per IP and globally before any DB work
+@router.get("/{secret_id}", response_model=SecretView, dependencies=[Depends(rate_limit("secret_view"))])
+async def get_secret(
+    secret_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    ip_address = client_ip(request)
+    user_agent = request.headers.get("user-agent")
+    write_behind = access_log_buffer.running
+
+    result = await db.execute(
+        consume_view_statement(secret_id, ip_address, user_agent, log_access=not write_behind)
+    )
+    row = result.first()
+
+    if row is None:
+        await db.rollback()
+
+        # Used-up and expired secrets are left to the expiry sweeper, which
+        # keeps used-up ones for ATTACHMENT_LINK_EXPIRE_MINUTES so a download
+        # link handed out with the last view still works
+        expired = await db.scalar(
+            select(Secret.expires_at <= func.now()).where(Secret.id == secret_id)
         )
+        if expired is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Secret not found"
+            )
 
-    # Check if max views reached
-    if secret.current_views >= secret.max_views:
-        db.delete(secret)
-        db.commit()
         raise HTTPException(
             status_code=status.HTTP_410_GONE,
-            detail="Secret has been viewed maximum times"
+            detail="Secret has expired" if expired else "Secret has been viewed maximum times"
         )
 
-    # Decrypt the secret
-    try:
-        encrypted_key = base64.b64decode(secret.encrypted_key)
-        key = SecretEncryption.decrypt_key(encrypted_key, settings.SECRET_KEY)
-
-        iv = base64.b64decode(secret.iv)
-        encrypted_content = base64.b64decode(secret.encrypted_content)
+    secret = Secret(**row._mapping)
 
-        decrypted_content = SecretEncryption.decrypt(encrypted_content, key, iv)
+    # Decrypt the secret; the view is only committed once this succeeds
+    try:
+        key = SecretEncryption.decrypt_key(secret.wrapped_key, secret.key_version)
+        decrypted_content = SecretEncryption.decrypt(secret.ciphertext, key, secret.content_iv)
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to decrypt secret"
         )
 
-    # Increment view count
-    secret.current_views += 1
+    await db.commit()
 
-    # Log access
-    access_log = AccessLog(
-        id=secrets_module.token_urlsafe(16),
-        secret_id=secret.id,
-        ip_address=request.client.host,
-        user_agent=request.headers.get("user-agent")
-    )
-    db.add(access_log)
+    await increment_usage_async(db, secret.created_by_id, secret_requests_this_month=1)
 
-    # Update usage stats for creator
-    usage = db.query(UsageStats).filter(UsageStats.user_id == secret.created_by_id).first()
-    if usage:
-        usage.secret_requests_this_month += 1
-
-    db.commit()
+    if write_behind:
+        access_log_buffer.add({
+            "id": secrets_module.token_urlsafe(16),
+            "secret_id": secret.id,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "accessed_at": datetime.now(timezone.utc)
+        })
 
     return {
         "id": secret.id,
@@ -189,67 +330,118 @@ def get_secret(
         "max_views": secret.max_views,
         "expires_at": secret.expires_at,
         "has_attachment": secret.has_attachment,
-        "attachment_url": secret.attachment_url,
+        "attachment_url": attachment_download_url(secret),
         "attachment_name": secret.attachment_name
     }
 
 
 @router.get("", response_model=List[SecretResponse])
-def list_secrets(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def list_secrets(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    secrets = db.query(Secret).filter(
-        Secret.created_by_id == current_user.id,
-        Secret.expires_at > datetime.now(timezone.utc)
-    ).order_by(Secret.created_at.desc()).all()
+    """Newest first, one page at a time; the next page's cursor is in X-Next-Cursor"""
+    secrets, next_cursor = await list_live_secrets(db, current_user.id, limit, parse_cursor(cursor))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return secrets
 
 
+@router.delete("", response_model=SecretDeleteResult)
+async def delete_secrets(
+    scope: SecretDeleteScope,
+    team_id: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete the caller's secrets matching scope in one statement"""
+    stmt = delete(Secret).where(Secret.created_by_id == current_user.id)
+
+    if scope == SecretDeleteScope.EXPIRED:
+        stmt = stmt.where(Secret.expires_at <= func.now())
+    elif scope == SecretDeleteScope.TEAM:
+        if not team_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="team_id is required for scope=team"
+            )
+        stmt = stmt.where(Secret.team_id == team_id)
+
+    result = await db.execute(stmt.returning(Secret.attachment_url))
+    blob_keys = list(result.scalars())
+    await db.commit()
+    await run_in_threadpool(delete_attachment_blobs, blob_keys)
+
+    return {"deleted": len(blob_keys)}
+
+
 @router.delete("/{secret_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_secret(
+async def delete_secret(
     secret_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    secret = db.query(Secret).filter(
-        Secret.id == secret_id,
-        Secret.created_by_id == current_user.id
-    ).first()
+    result = await db.execute(
+        delete(Secret).where(
+            Secret.id == secret_id,
+            Secret.created_by_id == current_user.id
+        ).returning(Secret.attachment_url)
+    )
+    deleted = result.first()
 
-    if not secret:
+    if deleted is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Secret not found"
         )
 
-    db.delete(secret)
-    db.commit()
+    await db.commit()
+    await run_in_threadpool(delete_attachment_blobs, [deleted.attachment_url])
 
     return None
 
 
 @router.get("/{secret_id}/logs", response_model=List[dict])
-def get_secret_logs(
+async def get_secret_logs(
     secret_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    secret = db.query(Secret).filter(
-        Secret.id == secret_id,
-        Secret.created_by_id == current_user.id
-    ).first()
+    """Most recent access first, paginated like list_secrets"""
+    result = await db.execute(
+        select(Secret.id).where(
+            Secret.id == secret_id,
+            Secret.created_by_id == current_user.id
+        )
+    )
 
-    if not secret:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Secret not found"
         )
 
-    logs = db.query(AccessLog).filter(
-        AccessLog.secret_id == secret_id
-    ).order_by(AccessLog.accessed_at.desc()).all()
+    query = select(AccessLog).where(AccessLog.secret_id == secret_id)
+
+    after = parse_cursor(cursor)
+    if after:
+        query = query.where(tuple_(AccessLog.accessed_at, AccessLog.id) < after)
+
+    result = await db.execute(
+        query.order_by(AccessLog.accessed_at.desc(), AccessLog.id.desc()).limit(limit + 1)
+    )
+    logs = result.scalars().all()
+
+    if len(logs) > limit:
+        logs = logs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].accessed_at, logs[-1].id)
 
     return [
         {
@@ -260,3 +452,226 @@ def get_secret_logs(
         }
         for log in logs
     ]
+
+
+@router.get("/{secret_id}/stats", response_model=AccessStats)
+async def get_secret_access_stats(
+    secret_id: str,
+    hours: int = Query(48, ge=1, le=720),
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    owned = select(Secret.id).where(
+        Secret.id == secret_id,
+        Secret.created_by_id == current_user.id
+    )
+
+    result = await db.execute(owned)
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Secret not found"
+        )
+
+    return await get_access_stats(db, owned, hours, days)
+
+
+def get_owned_secret(db: Session, secret_id: str, user_id: str) -> Optional[Secret]:
+    return db.query(Secret).filter(
+        Secret.id == secret_id,
+        Secret.created_by_id == user_id
+    ).first()
+
+
+def get_owned_secret_detached(db: Session, secret_id: str, user_id: str) -> Optional[Secret]:
+    """Load a secret and give the connection back to the pool before a long transfer"""
+    secret = get_owned_secret(db, secret_id, user_id)
+    db.close()
+    return secret
+
+
+def record_attachment(
+    db: Session, secret_id: str, blob_key: str, name: Optional[str], size: int, key_version: int
+) -> Optional[Secret]:
+    """Attach a stored blob unless the secret is gone or another upload attached one first"""
+    secret = db.execute(
+        update(Secret)
+        .where(Secret.id == secret_id, Secret.has_attachment.is_(False))
+        .values(
+            has_attachment=True,
+            attachment_url=blob_key,
+            attachment_name=name,
+            attachment_size=size,
+            attachment_key_version=key_version,
+        )
+        .returning(Secret)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    db.commit()
+    if not secret:
+        return None
+
+    db.refresh(secret)
+    increment_usage(db, secret.created_by_id, attachment_bytes_this_month=size)
+    return secret
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=' range into inclusive (start, end); None means the whole body"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = size - int(last), size - 1
+    except ValueError:
+        return None
+
+    start, end = max(start, 0), min(end, size - 1)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+@router.post("/{secret_id}/attachment", response_model=SecretResponse)
+async def upload_attachment(
+    secret_id: str,
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    secret = await run_in_threadpool(get_owned_secret_detached, db, secret_id, current_user.id)
+
+    if not secret:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Secret not found"
+        )
+
+    if secret.has_attachment:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Secret already has an attachment"
+        )
+
+    limit = plan_limits(current_user.plan).max_attachment_size
+    if limit <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Attachments are not available on your plan. Upgrade your plan."
+        )
+
+    try:
+        upload = MultipartFileStream(request)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Encrypt chunk by chunk as the body arrives; memory use is bounded by
+    # the chunk size (and the S3 part size), not the file size. Each upload
+    # gets its own key so a concurrent one can't overwrite this blob.
+    blob_key = f"{secret.id}-{secrets_module.token_hex(8)}"
+    encryptor = AttachmentEncryptor()
+    writer = await run_in_threadpool(blob_store.writer, blob_key)
+    try:
+        await run_in_threadpool(writer.write, encryptor.header)
+        async for data in upload:
+            if encryptor.size + len(data) > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Attachment exceeds your plan limit ({limit} bytes)"
+                )
+            chunks = encryptor.update(data)
+            if chunks:
+                await run_in_threadpool(writer.write, b"".join(chunks))
+        await run_in_threadpool(writer.write, encryptor.finalize())
+        await run_in_threadpool(writer.commit)
+    except BaseException as e:
+        await run_in_threadpool(writer.abort)
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        raise
+
+    secret = await run_in_threadpool(
+        record_attachment, db, secret_id, blob_key, upload.filename, encryptor.size, encryptor.key_version
+    )
+    if not secret:
+        await run_in_threadpool(blob_store.delete, blob_key)
+        # Deleted while the upload was in flight, or another upload won
+        if await run_in_threadpool(get_owned_secret_detached, db, secret_id, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Secret already has an attachment"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Secret not found"
+        )
+
+    return secret
+
+
+@router.get("/{secret_id}/attachment")
+def download_attachment(
+    secret_id: str,
+    token: str,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    payload = decode_access_token(token)
+    if not payload or payload.get("sub") != secret_id or payload.get("scope") != "attachment":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired attachment link"
+        )
+
+    secret = db.query(Secret).filter(Secret.id == secret_id).first()
+    # The body is streamed from the blob store, not the database
+    db.close()
+
+    if not secret or not secret.has_attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+
+    if secret.expires_at < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Secret has expired"
+        )
+
+    size = secret.attachment_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(secret.attachment_name or 'attachment')}",
+    }
+
+    byte_range = parse_range(request.headers.get("range"), size) if size else None
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            decrypt_attachment(blob_store.read(secret.attachment_url)),
+            media_type="application/octet-stream",
+            headers=headers
+        )
+
+    # Only the chunks covering the range are read and decrypted
+    start, end = byte_range
+    header = AttachmentHeader(b"".join(blob_store.read(secret.attachment_url, 0, AttachmentHeader.MAX_SIZE)))
+    offset, limit = attachment_range(header, size, start, end)
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        decrypt_attachment_range(header, blob_store.read(secret.attachment_url, offset, limit), size, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="application/octet-stream",
+        headers=headers
+    )
@@ -1,126 +1,101 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-import stripe
-from app.db.base import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import json
+from app.db.base import get_async_db, get_db
+from app.db.stripe_events import record_event
+from app.db.usage import get_usage_counts
 from app.schemas.subscription import SubscriptionResponse, CreateCheckoutSession, UsageResponse
 from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus
-from app.models.usage_stats import UsageStats
+from app.core.circuit_breaker import CircuitOpen
 from app.core.config import settings
-from app.api.deps import get_current_user
+from app.core.executor import ExecutorSaturated
+from app.core.payments import call_stripe, forget_customer, get_customer_subscription, stripe
+from app.core.plans import plan_for_price, plan_limits
+from app.api.deps import Principal, get_current_principal, invalidate_principal_async, response_cache
 
 router = APIRouter()
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 @router.get("/me", response_model=SubscriptionResponse)
 def get_my_subscription(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    subscription = db.query(Subscription).filter(
-        Subscription.user_id == current_user.id
-    ).first()
+    def build():
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == current_user.id
+        ).first()
 
-    if not subscription:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Subscription not found"
-        )
+        if not subscription:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Subscription not found"
+            )
 
-    return subscription
+        return SubscriptionResponse.model_validate(subscription)
+
+    return response_cache.respond(request, current_user.id, "subscription", build)
 
 
 @router.get("/usage", response_model=UsageResponse)
 def get_usage(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    from datetime import datetime, timezone
-
-    usage = db.query(UsageStats).filter(UsageStats.user_id == current_user.id).first()
-    subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
-
-    # Reset usage on 1st of month (only for free plan)
-    is_free_plan = not subscription or subscription.plan == SubscriptionPlan.FREE
-    if is_free_plan and usage:
-        now = datetime.now(timezone.utc)
-        if now >= usage.period_end:
-            # Calculate new period (1st of current month to 1st of next month)
-            period_start = datetime(now.year, now.month, 1, 0, 0, 0, tzinfo=timezone.utc)
-
-            # Calculate first day of next month
-            if now.month == 12:
-                period_end = datetime(now.year + 1, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
-            else:
-                period_end = datetime(now.year, now.month + 1, 1, 0, 0, 0, tzinfo=timezone.utc)
-
-            # Reset counters
-            usage.secrets_created_this_month = 0
-            usage.secret_requests_this_month = 0
-            usage.attachment_bytes_this_month = 0
-            usage.period_start = period_start
-            usage.period_end = period_end
-            db.commit()
-
-    if not subscription:
-        limit_secrets = settings.FREE_SECRETS_PER_MONTH
-        limit_attachments = settings.FREE_MAX_ATTACHMENT_SIZE
-        limit_team_size = settings.FREE_TEAM_SIZE
-    elif subscription.plan == SubscriptionPlan.FREE:
-        limit_secrets = settings.FREE_SECRETS_PER_MONTH
-        limit_attachments = settings.FREE_MAX_ATTACHMENT_SIZE
-        limit_team_size = settings.FREE_TEAM_SIZE
-    elif subscription.plan == SubscriptionPlan.PRO:
-        limit_secrets = settings.PRO_SECRETS_PER_MONTH
-        limit_attachments = settings.PRO_MAX_ATTACHMENT_SIZE
-        limit_team_size = settings.PRO_TEAM_SIZE
-    elif subscription.plan == SubscriptionPlan.TEAM:
-        limit_secrets = settings.TEAM_SECRETS_PER_MONTH
-        limit_attachments = settings.TEAM_MAX_ATTACHMENT_SIZE
-        limit_team_size = settings.TEAM_TEAM_SIZE
-    else:
-        limit_secrets = 9999999
-        limit_attachments = 100 * 1024 * 1024
-        limit_team_size = 9999
+    usage = get_usage_counts(db, current_user.id)
+    limits = plan_limits(current_user.plan)
 
     return {
-        "secrets_created_this_month": usage.secrets_created_this_month if usage else 0,
-        "secret_requests_this_month": usage.secret_requests_this_month if usage else 0,
-        "attachment_bytes_this_month": usage.attachment_bytes_this_month if usage else 0,
-        "limit_secrets": limit_secrets,
-        "limit_attachments": limit_attachments,
-        "limit_team_size": limit_team_size
+        "secrets_created_this_month": usage["secrets_created_this_month"],
+        "secret_requests_this_month": usage["secret_requests_this_month"],
+        "attachment_bytes_this_month": usage["attachment_bytes_this_month"],
+        "limit_secrets": limits.secrets_per_month,
+        "limit_attachments": limits.max_attachment_size,
+        "limit_team_size": limits.team_size
     }
 
 
+async def get_user_subscription(db: AsyncSession, user_id: str) -> Optional[Subscription]:
+    result = await db.execute(select(Subscription).where(Subscription.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+# Checkout, portal and sync make their Stripe calls through call_stripe, so
+# they run on the Stripe pool with a timeout and fail fast (CircuitOpen,
+# ExecutorSaturated -> 503) while Stripe is struggling
 @router.post("/checkout")
-def create_checkout_session(
+async def create_checkout_session(
     data: CreateCheckoutSession,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    subscription = db.query(Subscription).filter(
-        Subscription.user_id == current_user.id
-    ).first()
+    subscription = await get_user_subscription(db, current_user.id)
 
     try:
         # Create or get Stripe customer
         if subscription and subscription.stripe_customer_id:
             customer_id = subscription.stripe_customer_id
         else:
-            customer = stripe.Customer.create(
-                email=current_user.email,
+            email = await db.scalar(select(User.email).where(User.id == current_user.id))
+            customer = await call_stripe(
+                stripe.Customer.create,
+                email=email,
                 metadata={"user_id": current_user.id}
             )
             customer_id = customer.id
 
             if subscription:
                 subscription.stripe_customer_id = customer_id
-                db.commit()
+                await db.commit()
 
         # Create checkout session
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = await call_stripe(
+            stripe.checkout.Session.create,
             customer=customer_id,
             payment_method_types=["card"],
             line_items=[{
@@ -132,9 +107,12 @@ def create_checkout_session(
             cancel_url=data.cancel_url,
             metadata={"user_id": current_user.id}
         )
+        forget_customer(customer_id)
 
         return {"checkout_url": checkout_session.url}
 
+    except (CircuitOpen, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -143,13 +121,11 @@ def create_checkout_session(
 
 
 @router.post("/portal")
-def create_portal_session(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def create_portal_session(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    subscription = db.query(Subscription).filter(
-        Subscription.user_id == current_user.id
-    ).first()
+    subscription = await get_user_subscription(db, current_user.id)
 
     if not subscription or not subscription.stripe_customer_id:
         raise HTTPException(
@@ -158,13 +134,17 @@ def create_portal_session(
         )
 
     try:
-        portal_session = stripe.billing_portal.Session.create(
+        portal_session = await call_stripe(
+            stripe.billing_portal.Session.create,
             customer=subscription.stripe_customer_id,
             return_url=f"{settings.CORS_ORIGINS[0]}/dashboard"
         )
+        forget_customer(subscription.stripe_customer_id)
 
         return {"portal_url": portal_session.url}
 
+    except (CircuitOpen, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -173,14 +153,17 @@ def create_portal_session(
 
 
 @router.post("/sync")
-def sync_subscription(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def sync_subscription(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Manually sync subscription from Stripe (useful for local dev)"""
-    subscription = db.query(Subscription).filter(
-        Subscription.user_id == current_user.id
-    ).first()
+    """Manually sync subscription from Stripe (useful for local dev).
+
+    Stripe's answer is cached per customer for STRIPE_SYNC_CACHE_TTL_SECONDS
+    and concurrent syncs share one request, so page loads that sync don't
+    each call Stripe. The row is only written when something changed.
+    """
+    subscription = await get_user_subscription(db, current_user.id)
 
     if not subscription or not subscription.stripe_customer_id:
         raise HTTPException(
@@ -189,42 +172,37 @@ def sync_subscription(
         )
 
     try:
-        # Get all subscriptions for this customer
-        stripe_subs = stripe.Subscription.list(customer=subscription.stripe_customer_id)
-
-        if stripe_subs.data:
-            # Get the first active subscription
-            stripe_sub = stripe_subs.data[0]
-            price_id = stripe_sub["items"]["data"][0]["price"]["id"]
-
-            # Update plan based on price ID
-            if price_id == settings.STRIPE_PRICE_ID_PRO:
-                subscription.plan = SubscriptionPlan.PRO
-            elif price_id == settings.STRIPE_PRICE_ID_TEAM:
-                subscription.plan = SubscriptionPlan.TEAM
-            else:
-                subscription.plan = SubscriptionPlan.FREE
-
-            subscription.stripe_subscription_id = stripe_sub.id
-            subscription.status = SubscriptionStatus.ACTIVE if stripe_sub.status == "active" else SubscriptionStatus.CANCELED
-            db.commit()
-
-        return subscription
-
+        stripe_sub = await get_customer_subscription(subscription.stripe_customer_id)
+    except (CircuitOpen, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to sync subscription: {str(e)}"
         )
 
+    if stripe_sub:
+        plan = plan_for_price(stripe_sub.price_id) or SubscriptionPlan.FREE
+        sub_status = SubscriptionStatus.ACTIVE if stripe_sub.status == "active" else SubscriptionStatus.CANCELED
+
+        current = (subscription.plan, subscription.status, subscription.stripe_subscription_id)
+        if current != (plan, sub_status, stripe_sub.id):
+            subscription.plan = plan
+            subscription.status = sub_status
+            subscription.stripe_subscription_id = stripe_sub.id
+            await db.commit()
+            await invalidate_principal_async(subscription.user_id)
+
+    return subscription
+
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
     except ValueError:
@@ -232,58 +210,8 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # Handle the event
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        user_id = session["metadata"]["user_id"]
-
-        subscription = db.query(Subscription).filter(
-            Subscription.user_id == user_id
-        ).first()
-
-        if subscription:
-            subscription.stripe_subscription_id = session["subscription"]
-            subscription.status = SubscriptionStatus.ACTIVE
-
-            # Get the subscription details to determine the plan
-            stripe_sub = stripe.Subscription.retrieve(session["subscription"])
-            price_id = stripe_sub["items"]["data"][0]["price"]["id"]
-
-            # Update plan based on price ID
-            if price_id == settings.STRIPE_PRICE_ID_PRO:
-                subscription.plan = SubscriptionPlan.PRO
-            elif price_id == settings.STRIPE_PRICE_ID_TEAM:
-                subscription.plan = SubscriptionPlan.TEAM
-
-            db.commit()
-
-    elif event["type"] == "customer.subscription.updated":
-        stripe_sub = event["data"]["object"]
-
-        subscription = db.query(Subscription).filter(
-            Subscription.stripe_subscription_id == stripe_sub["id"]
-        ).first()
-
-        if subscription:
-            # Update plan based on price ID
-            if stripe_sub["items"]["data"][0]["price"]["id"] == settings.STRIPE_PRICE_ID_PRO:
-                subscription.plan = SubscriptionPlan.PRO
-            elif stripe_sub["items"]["data"][0]["price"]["id"] == settings.STRIPE_PRICE_ID_TEAM:
-                subscription.plan = SubscriptionPlan.TEAM
-
-            subscription.status = SubscriptionStatus.ACTIVE
-            db.commit()
-
-    elif event["type"] == "customer.subscription.deleted":
-        stripe_sub = event["data"]["object"]
-
-        subscription = db.query(Subscription).filter(
-            Subscription.stripe_subscription_id == stripe_sub["id"]
-        ).first()
-
-        if subscription:
-            subscription.plan = SubscriptionPlan.FREE
-            subscription.status = SubscriptionStatus.CANCELED
-            db.commit()
+    # Only recorded here; python -m app.jobs.stripe_events applies it. A
+    # redelivered event id is ignored.
+    await record_event(db, json.loads(payload))
 
     return {"status": "success"}
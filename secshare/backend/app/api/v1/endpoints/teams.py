@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 import secrets
 from app.db.base import get_db
 from app.models.user import User
 from app.models.team import Team
-from app.api.deps import get_current_user
+from app.api.deps import Principal, get_current_principal, get_current_user, invalidate_principal, response_cache
 
 router = APIRouter()
 
@@ -46,51 +46,59 @@ def create_team(
 
     db.commit()
     db.refresh(team)
+    invalidate_principal(current_user.id)
 
     return team
 
 
 @router.get("/me")
 def get_my_team(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    if not current_user.team_id:
-        return None
+    def build():
+        if not current_user.team_id:
+            return None
 
-    team = db.query(Team).filter(Team.id == current_user.team_id).first()
-    return team
+        return db.query(Team).filter(Team.id == current_user.team_id).first()
+
+    return response_cache.respond(request, current_user.id, "team", build)
 
 
 @router.get("/{team_id}/members", response_model=List[dict])
 def get_team_members(
     team_id: str,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    team = db.query(Team).filter(Team.id == team_id).first()
-
-    if not team:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
-
-    # Check if user is member of this team
-    if current_user.team_id != team_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not a member of this team"
-        )
-
-    members = db.query(User).filter(User.team_id == team_id).all()
-
-    return [
-        {
-            "id": member.id,
-            "email": member.email,
-            "name": member.name,
-            "is_owner": member.id == team.owner_id
-        }
-        for member in members
-    ]
+    def build():
+        team = db.query(Team).filter(Team.id == team_id).first()
+
+        if not team:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Team not found"
+            )
+
+        # Check if user is member of this team
+        if current_user.team_id != team_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a member of this team"
+            )
+
+        members = db.query(User).filter(User.team_id == team_id).all()
+
+        return [
+            {
+                "id": member.id,
+                "email": member.email,
+                "name": member.name,
+                "is_owner": member.id == team.owner_id
+            }
+            for member in members
+        ]
+
+    return response_cache.respond(request, current_user.id, f"team_members:{team_id}", build)
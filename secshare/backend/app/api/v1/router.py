@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, secrets, subscriptions, teams
+from app.api.v1.endpoints import auth, dashboard, secrets, subscriptions, teams
 
 api_router = APIRouter()
 
@@ -7,3 +7,4 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(secrets.router, prefix="/secrets", tags=["secrets"])
 api_router.include_router(subscriptions.router, prefix="/subscriptions", tags=["subscriptions"])
 api_router.include_router(teams.router, prefix="/teams", tags=["teams"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
@@ -0,0 +1,85 @@
+import math
+import threading
+import time
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency that has been failing"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is unavailable")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops calling a dependency after consecutive failures, then probes it.
+
+    After failure_threshold failures in a row the circuit opens and before_call()
+    raises CircuitOpen for reset_seconds. The first call after that is let
+    through as a probe: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._opens = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._failures < self.failure_threshold:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            self._rejected += 1
+            remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+            raise CircuitOpen(self.name, max(1, math.ceil(remaining)))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+
+    def release(self) -> None:
+        """End a call without a verdict, e.g. when it never reached the dependency"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold:
+                if self._failures == self.failure_threshold:
+                    self._opens += 1
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opens": self._opens,
+                "rejected": self._rejected,
+            }
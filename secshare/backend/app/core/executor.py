@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a BoundedExecutor's admission limit is reached"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} executor is saturated")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def _timed(fn: Callable, *args) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class BoundedExecutor:
+    """Dedicated worker pool that rejects work instead of queueing without bound"""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_queue: int,
+        use_processes: bool = False,
+        retry_after: int = 1,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        self._pool: Executor
+        if use_processes:
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._run_seconds_total = 0.0
+        self._run_seconds_max = 0.0
+        self._wait_seconds_total = 0.0
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.name, self.retry_after)
+            self._in_flight += 1
+            self._submitted += 1
+
+    def _release(self, future: Future, started: float) -> None:
+        """Free the slot once the pool is done with the job, not when its caller stops waiting"""
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                # Dropped from the queue before it ran
+                return
+            run_seconds = 0.0 if future.exception() else future.result()[1]
+            self._completed += 1
+            self._run_seconds_total += run_seconds
+            self._run_seconds_max = max(self._run_seconds_max, run_seconds)
+            self._wait_seconds_total += max(0.0, time.perf_counter() - started - run_seconds)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool, raising ExecutorSaturated if it is full"""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            future = self._pool.submit(_timed, fn, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda done: self._release(done, started))
+
+        # Cancelling the caller cancels a queued job; a running one keeps its slot until it ends
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "run_seconds_avg": self._run_seconds_total / completed,
+                "run_seconds_max": self._run_seconds_max,
+                "wait_seconds_avg": self._wait_seconds_total / completed,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
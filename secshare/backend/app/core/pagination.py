@@ -0,0 +1,26 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+# Returned on paginated list endpoints when there is another page; pass it
+# back as ?cursor= to continue after the last item
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, item_id: str) -> str:
+    """Opaque cursor pointing just past the (timestamp, id) of the last item"""
+    raw = f"{sort_value.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for anything encode_cursor didn't produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Malformed cursor") from exc
+
+    sort_value, sep, item_id = raw.partition("|")
+    if not sep or not item_id:
+        raise ValueError("Malformed cursor")
+    return datetime.fromisoformat(sort_value), item_id
@@ -0,0 +1,105 @@
+import functools
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import stripe
+
+from app.core.cache import SingleFlight, TTLCache
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+from app.core.executor import BoundedExecutor
+
+# Everything that talks to Stripe imports the SDK from here so it is
+# configured the same way in the API and in the background jobs
+stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
+stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+stripe.default_http_client = stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT_SECONDS)
+
+# Failures that say Stripe, or the way to it, is unwell, as opposed to a
+# request Stripe answered and refused
+TRANSIENT_ERRORS = (stripe.error.APIConnectionError, stripe.error.APIError, stripe.error.RateLimitError)
+
+# The SDK is blocking; request handlers use call_stripe() so a slow Stripe
+# ties up this pool rather than the event loop or the shared threadpool
+stripe_executor = BoundedExecutor(
+    "stripe",
+    max_workers=settings.STRIPE_MAX_WORKERS,
+    max_queue=settings.STRIPE_MAX_QUEUE,
+)
+stripe_breaker = CircuitBreaker(
+    "stripe",
+    failure_threshold=settings.STRIPE_BREAKER_FAILURES,
+    reset_seconds=settings.STRIPE_BREAKER_RESET_SECONDS,
+)
+
+
+async def call_stripe(fn: Callable, *args, **kwargs) -> Any:
+    """Run a Stripe SDK call on the Stripe pool, behind the circuit breaker"""
+    stripe_breaker.before_call()
+    try:
+        result = await stripe_executor.run(functools.partial(fn, *args, **kwargs))
+    except TRANSIENT_ERRORS:
+        stripe_breaker.record_failure()
+        raise
+    except stripe.error.StripeError:
+        stripe_breaker.record_success()
+        raise
+    except BaseException:
+        stripe_breaker.release()
+        raise
+    stripe_breaker.record_success()
+    return result
+
+
+@dataclass(frozen=True)
+class CustomerSubscription:
+    """The parts of a customer's latest Stripe subscription that sync uses"""
+    id: str
+    status: str
+    price_id: str
+
+
+# Per process; the TTL bounds how stale a sync can be after a change in Stripe
+customer_subscriptions = TTLCache(max_entries=10000, ttl_seconds=settings.STRIPE_SYNC_CACHE_TTL_SECONDS)
+customer_fetches = SingleFlight()
+
+
+async def get_customer_subscription(customer_id: str) -> Optional[CustomerSubscription]:
+    """Latest subscription for a customer, cached briefly and fetched once at a time"""
+    cached = customer_subscriptions.get(customer_id)
+    if cached is not None:
+        return cached[0]
+    return await customer_fetches.do(customer_id, lambda: fetch_customer_subscription(customer_id))
+
+
+async def fetch_customer_subscription(customer_id: str) -> Optional[CustomerSubscription]:
+    stripe_subs = await call_stripe(stripe.Subscription.list, customer=customer_id, limit=1)
+
+    subscription = None
+    if stripe_subs.data:
+        stripe_sub = stripe_subs.data[0]
+        subscription = CustomerSubscription(
+            id=stripe_sub.id,
+            status=stripe_sub.status,
+            price_id=stripe_sub["items"]["data"][0]["price"]["id"]
+        )
+
+    # Wrapped so "no subscription" is cached too
+    customer_subscriptions.set(customer_id, (subscription,))
+    return subscription
+
+
+def forget_customer(customer_id: str) -> None:
+    """Drop the cached subscription once the customer is sent off to change it"""
+    customer_subscriptions.delete(customer_id)
+
+
+def stripe_stats() -> dict:
+    return {
+        "executor": stripe_executor.stats(),
+        "breaker": stripe_breaker.stats(),
+        "subscription_cache": customer_subscriptions.stats(),
+        "subscription_fetches": {"calls": customer_fetches.calls, "shared": customer_fetches.shared},
+    }
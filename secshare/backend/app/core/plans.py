@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+from app.core.config import Settings, settings
+from app.models.subscription import SubscriptionPlan
+
+
+@dataclass(frozen=True)
+class PlanLimits:
+    secrets_per_month: int
+    max_attachment_size: int
+    team_size: int
+
+
+def build_plan_limits(settings: Settings) -> Mapping[SubscriptionPlan, PlanLimits]:
+    return MappingProxyType({
+        SubscriptionPlan.FREE: PlanLimits(
+            secrets_per_month=settings.FREE_SECRETS_PER_MONTH,
+            max_attachment_size=settings.FREE_MAX_ATTACHMENT_SIZE,
+            team_size=settings.FREE_TEAM_SIZE,
+        ),
+        SubscriptionPlan.PRO: PlanLimits(
+            secrets_per_month=settings.PRO_SECRETS_PER_MONTH,
+            max_attachment_size=settings.PRO_MAX_ATTACHMENT_SIZE,
+            team_size=settings.PRO_TEAM_SIZE,
+        ),
+        SubscriptionPlan.TEAM: PlanLimits(
+            secrets_per_month=settings.TEAM_SECRETS_PER_MONTH,
+            max_attachment_size=settings.TEAM_MAX_ATTACHMENT_SIZE,
+            team_size=settings.TEAM_TEAM_SIZE,
+        ),
+        SubscriptionPlan.ENTERPRISE: PlanLimits(
+            secrets_per_month=settings.ENTERPRISE_SECRETS_PER_MONTH,
+            max_attachment_size=settings.ENTERPRISE_MAX_ATTACHMENT_SIZE,
+            team_size=settings.ENTERPRISE_TEAM_SIZE,
+        ),
+    })
+
+
+def build_price_plans(settings: Settings) -> Mapping[str, SubscriptionPlan]:
+    """Stripe price id -> plan, for the price ids that are configured"""
+    prices = {
+        settings.STRIPE_PRICE_ID_PRO: SubscriptionPlan.PRO,
+        settings.STRIPE_PRICE_ID_TEAM: SubscriptionPlan.TEAM,
+        settings.STRIPE_PRICE_ID_ENTERPRISE: SubscriptionPlan.ENTERPRISE,
+    }
+    return MappingProxyType({price_id: plan for price_id, plan in prices.items() if price_id})
+
+
+# Built once at import; settings don't change while the process runs
+PLAN_LIMITS = build_plan_limits(settings)
+PRICE_PLANS = build_price_plans(settings)
+
+
+def plan_limits(plan: Optional[SubscriptionPlan]) -> PlanLimits:
+    """Limits for a plan; users without a subscription get the free plan's"""
+    return PLAN_LIMITS[plan or SubscriptionPlan.FREE]
+
+
+def plan_for_price(price_id: Optional[str]) -> Optional[SubscriptionPlan]:
+    """Plan a Stripe price id is sold as, or None for prices we don't know"""
+    return PRICE_PLANS.get(price_id)
@@ -0,0 +1,162 @@
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import redis
+
+from app.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one bucket per scope. ARGV: now (ms), then capacity and refill rate
+# (tokens per ms) per bucket. A token is only taken if every bucket has one.
+# Returns the 1-based index of the first empty bucket (0 if allowed) and
+# how many ms until it has a token again.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local denied = 0
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    tokens[i] = available
+    if available < 1 then
+        if denied == 0 then denied = i end
+        retry_after = math.max(retry_after, math.ceil((1 - available) / rate))
+    end
+end
+if denied == 0 then
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[2 * i])
+        local rate = tonumber(ARGV[2 * i + 1])
+        redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', tostring(now))
+        redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+    end
+end
+return {denied, retry_after}
+"""
+
+
+@dataclass(frozen=True)
+class Bucket:
+    capacity: float
+    rate: float  # tokens per second
+
+    @classmethod
+    def parse(cls, spec: str) -> "Bucket":
+        """'30/60' is a burst of 30 requests, refilled in full over 60 seconds"""
+        burst, _, seconds = spec.partition("/")
+        capacity = float(burst)
+        return cls(capacity=capacity, rate=capacity / float(seconds or 1))
+
+
+class RateLimited(Exception):
+    """Raised when a request finds one of its token buckets empty"""
+
+    def __init__(self, route: str, scope: str, retry_after: int):
+        super().__init__(f"{route} rate limit ({scope}) exceeded")
+        self.route = route
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """Token buckets per route and scope, kept in Redis and checked atomically.
+
+    If Redis is unavailable each process falls back to its own in-memory
+    buckets, so the effective limit is multiplied by the number of workers
+    until Redis is back.
+    """
+
+    def __init__(self, client, rules: Dict[str, Dict[str, str]], key_prefix: str = "ratelimit"):
+        self.rules = {
+            route: {scope: Bucket.parse(spec) for scope, spec in scopes.items()}
+            for route, scopes in rules.items()
+        }
+        self.key_prefix = key_prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._local = TTLCache(max_entries=100000, ttl_seconds=24 * 3600)
+        self._local_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._allowed: Dict[str, int] = {}
+        self._rejected: Dict[Tuple[str, str], int] = {}
+        self._fallbacks = 0
+
+    def buckets(self, route: str, client_ip: str) -> List[Tuple[str, str, Bucket]]:
+        """(scope, key, bucket) for every limit configured on a route"""
+        buckets = []
+        for scope, bucket in self.rules.get(route, {}).items():
+            subject = client_ip if scope == "per_ip" else "all"
+            buckets.append((scope, f"{self.key_prefix}:{route}:{scope}:{subject}", bucket))
+        return buckets
+
+    async def check(self, route: str, client_ip: str) -> None:
+        """Take one token from each of the route's buckets or raise RateLimited"""
+        buckets = self.buckets(route, client_ip)
+        if not buckets:
+            return
+
+        try:
+            denied, retry_after_ms = await self._check_redis(buckets)
+        except redis.RedisError:
+            logger.warning("Rate limiter falling back to in-process buckets", exc_info=True)
+            with self._lock:
+                self._fallbacks += 1
+            denied, retry_after_ms = self._check_local(buckets)
+
+        with self._lock:
+            if denied:
+                scope = buckets[denied - 1][0]
+                self._rejected[(route, scope)] = self._rejected.get((route, scope), 0) + 1
+            else:
+                self._allowed[route] = self._allowed.get(route, 0) + 1
+
+        if denied:
+            raise RateLimited(route, buckets[denied - 1][0], max(1, math.ceil(retry_after_ms / 1000)))
+
+    async def _check_redis(self, buckets) -> Tuple[int, int]:
+        args = [int(time.time() * 1000)]
+        for _, _, bucket in buckets:
+            args += [bucket.capacity, bucket.rate / 1000]
+        denied, retry_after_ms = await self._script(keys=[key for _, key, _ in buckets], args=args)
+        return int(denied), int(retry_after_ms)
+
+    def _check_local(self, buckets) -> Tuple[int, int]:
+        """Same algorithm as TOKEN_BUCKET_SCRIPT against per-process state"""
+        now = time.monotonic()
+        with self._local_lock:
+            states = []
+            denied = 0
+            retry_after = 0.0
+            for i, (_, key, bucket) in enumerate(buckets, start=1):
+                tokens, ts = self._local.get(key) or (bucket.capacity, now)
+                tokens = min(bucket.capacity, tokens + max(0.0, now - ts) * bucket.rate)
+                states.append(tokens)
+                if tokens < 1:
+                    denied = denied or i
+                    retry_after = max(retry_after, (1 - tokens) / bucket.rate)
+
+            if not denied:
+                for tokens, (_, key, bucket) in zip(states, buckets):
+                    self._local.set(key, (tokens - 1, now), ttl_seconds=bucket.capacity / bucket.rate)
+
+        return denied, math.ceil(retry_after * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {}
+            for route, scopes in self.rules.items():
+                routes[route] = {
+                    "allowed": self._allowed.get(route, 0),
+                    "rejected": {scope: self._rejected.get((route, scope), 0) for scope in scopes},
+                }
+            return {"routes": routes, "fallbacks": self._fallbacks}
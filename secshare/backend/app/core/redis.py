@@ -0,0 +1,12 @@
+import redis
+import redis.asyncio
+from app.core.config import settings
+
+timeouts = {
+    "socket_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+}
+
+# Both clients connect lazily, so importing this module doesn't need Redis up
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True, **timeouts)
+async_redis_client = redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True, **timeouts)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+import redis
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+# KEYS: the user's response hash, their generation key. ARGV: field, entry,
+# the generation seen before building the response, TTL. Skips the write if
+# the user was invalidated meanwhile, so a stale build can't be cached.
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for on If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """Serialized JSON responses cached in Redis per user, served with ETags.
+
+    A user's entries share one hash, so invalidate() drops them all at once.
+    It also bumps a per-user generation that in-flight builds check before
+    storing, so a response read before a write can't be cached after it.
+    When Redis is unavailable responses are built on every request.
+    """
+
+    def __init__(
+        self, client, async_client, ttl_seconds: int, enabled: bool = True, key_prefix: str = "responses"
+    ):
+        self.client = client
+        self.async_client = async_client
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.key_prefix = key_prefix
+        self._store = client.register_script(STORE_SCRIPT)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def keys(self, user_id: str) -> Tuple[str, str]:
+        return f"{self.key_prefix}:{user_id}", f"{self.key_prefix}:{user_id}:gen"
+
+    def respond(self, request: Request, user_id: str, name: str, build: Callable[[], Any]) -> Response:
+        """Serve `name` for this user from the cache, calling build() on a miss.
+
+        build() returns anything jsonable_encoder accepts; exceptions it
+        raises (e.g. HTTPException) propagate and nothing is cached.
+        """
+        entry, generation = self._lookup(user_id, name)
+        if entry is None:
+            body = json.dumps(
+                jsonable_encoder(build()), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            )
+            etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+            if generation is not None:
+                self._save(user_id, name, f"{etag} {body}", generation)
+        else:
+            etag, _, body = entry.partition(" ")
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self._count("not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def invalidate(self, user_id: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._invalidation(self.client.pipeline(transaction=True), user_id).execute()
+        except redis.RedisError:
+            self._invalidation_failed(user_id)
+
+    async def invalidate_async(self, user_id: str) -> None:
+        """invalidate() for code running on the event loop"""
+        if not self.enabled:
+            return
+        try:
+            await self._invalidation(self.async_client.pipeline(transaction=True), user_id).execute()
+        except redis.RedisError:
+            self._invalidation_failed(user_id)
+
+    def _invalidation(self, pipe, user_id: str):
+        entries, generation = self.keys(user_id)
+        pipe.incr(generation)
+        pipe.expire(generation, self.ttl_seconds)
+        pipe.delete(entries)
+        return pipe
+
+    def _invalidation_failed(self, user_id: str) -> None:
+        # Entries then live until their TTL; nothing else to fall back to
+        logger.exception("Could not invalidate cached responses for user %s", user_id)
+        self._count("errors")
+
+    def _lookup(self, user_id: str, name: str) -> Tuple[Optional[str], Optional[str]]:
+        """(cached entry, current generation); generation is None when not caching"""
+        if not self.enabled:
+            return None, None
+        entries, generation = self.keys(user_id)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hget(entries, name)
+            pipe.get(generation)
+            entry, current = pipe.execute()
+        except redis.RedisError:
+            logger.warning("Response cache unavailable", exc_info=True)
+            self._count("errors")
+            return None, None
+
+        self._count("hits" if entry is not None else "misses")
+        return entry, current or ""
+
+    def _save(self, user_id: str, name: str, entry: str, generation: str) -> None:
+        try:
+            self._store(keys=list(self.keys(user_id)), args=[name, entry, generation, self.ttl_seconds])
+        except redis.RedisError:
+            logger.warning("Response cache unavailable", exc_info=True)
+            self._count("errors")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "errors": self.errors,
+            }
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -7,10 +7,21 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
 import base64
+import struct
 from app.core.config import settings
+from app.core.executor import BoundedExecutor
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is CPU-bound; keep it off the shared request threadpool
+password_executor = BoundedExecutor(
+    "password-hashing",
+    max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,6 +31,14 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,6 +58,49 @@ def decode_access_token(token: str):
         return None
 
 
+def derive_master_key(master_key: str) -> bytes:
+    """Derive a 256-bit AES key from a master secret with PBKDF2"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=b"secshare",  # In production, use a proper salt
+        iterations=100000,
+    )
+    return kdf.derive(master_key.encode())
+
+
+class MasterKeyring:
+    """Master keys indexed by version, derived once per process so the KDF stays off the request path"""
+
+    def __init__(self, master_keys: Dict[int, str], active_version: int):
+        if active_version not in master_keys:
+            raise ValueError(f"Master key version {active_version} is not configured")
+
+        self._ciphers: Dict[int, AESGCM] = {
+            version: AESGCM(derive_master_key(master_key))
+            for version, master_key in master_keys.items()
+        }
+        self.active_version = active_version
+
+    @classmethod
+    def from_settings(cls) -> "MasterKeyring":
+        master_keys = {1: settings.SECRET_KEY, **settings.MASTER_KEYS}
+        return cls(master_keys, settings.MASTER_KEY_VERSION)
+
+    @property
+    def versions(self) -> Tuple[int, ...]:
+        return tuple(sorted(self._ciphers))
+
+    def get(self, version: int) -> AESGCM:
+        try:
+            return self._ciphers[version]
+        except KeyError:
+            raise ValueError(f"Unknown master key version {version}")
+
+
+master_keyring = MasterKeyring.from_settings()
+
+
 class SecretEncryption:
     """Handles encryption and decryption of secrets using AES-GCM"""
 
@@ -67,35 +129,178 @@ class SecretEncryption:
         return plaintext.decode()
 
     @staticmethod
-    def encrypt_key(key: bytes, master_key: str) -> bytes:
-        """Encrypt the secret key using a master key derived from settings"""
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b"secshare",  # In production, use a proper salt
-            iterations=100000,
-        )
-        derived_key = kdf.derive(master_key.encode())
-
+    def encrypt_key(key: bytes) -> Tuple[bytes, int]:
+        """Encrypt the secret key with the active master key, returning (wrapped_key, key_version)"""
+        version = master_keyring.active_version
         iv = os.urandom(12)
-        aesgcm = AESGCM(derived_key)
-        encrypted = aesgcm.encrypt(iv, key, None)
-        return iv + encrypted
+        encrypted = master_keyring.get(version).encrypt(iv, key, None)
+        return iv + encrypted, version
 
     @staticmethod
-    def decrypt_key(encrypted_key: bytes, master_key: str) -> bytes:
-        """Decrypt the secret key using the master key"""
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b"secshare",
-            iterations=100000,
-        )
-        derived_key = kdf.derive(master_key.encode())
-
+    def decrypt_key(encrypted_key: bytes, key_version: int = 1) -> bytes:
+        """Decrypt the secret key using the master key it was wrapped with"""
         iv = encrypted_key[:12]
         ciphertext = encrypted_key[12:]
 
-        aesgcm = AESGCM(derived_key)
-        key = aesgcm.decrypt(iv, ciphertext, None)
+        key = master_keyring.get(key_version).decrypt(iv, ciphertext, None)
         return key
+
+
+# magic, key version, chunk size, nonce prefix, wrapped key length
+_ATTACHMENT_HEADER = struct.Struct(">4sHI7sH")
+_ATTACHMENT_MAGIC = b"SSA1"
+_TAG_SIZE = 16
+
+
+def _chunk_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    if counter >= 2 ** 32:
+        raise ValueError("Attachment has too many chunks")
+    return prefix + counter.to_bytes(4, "big") + (b"\x01" if last else b"\x00")
+
+
+class AttachmentEncryptor:
+    """Encrypts a byte stream into a header followed by fixed-size AES-GCM chunks.
+
+    Each chunk is sealed with a nonce built from a random prefix, its index and
+    a last-chunk flag, and authenticates the header, so chunks cannot be
+    reordered, dropped or truncated without decryption failing.
+    """
+
+    def __init__(self, chunk_size: int = settings.ATTACHMENT_CHUNK_SIZE):
+        key = SecretEncryption.generate_key()
+        wrapped_key, key_version = SecretEncryption.encrypt_key(key)
+
+        self.chunk_size = chunk_size
+        self.key_version = key_version
+        self.size = 0
+        self._aesgcm = AESGCM(key)
+        self._nonce_prefix = os.urandom(7)
+        self._counter = 0
+        self._buffer = bytearray()
+        self.header = _ATTACHMENT_HEADER.pack(
+            _ATTACHMENT_MAGIC, key_version, chunk_size, self._nonce_prefix, len(wrapped_key)
+        ) + wrapped_key
+
+    def _seal(self, chunk: bytes, last: bool) -> bytes:
+        nonce = _chunk_nonce(self._nonce_prefix, self._counter, last)
+        self._counter += 1
+        return self._aesgcm.encrypt(nonce, chunk, self.header)
+
+    def update(self, data: bytes) -> List[bytes]:
+        """Buffer data and return every chunk that is now complete"""
+        self._buffer += data
+        self.size += len(data)
+
+        chunks = []
+        while len(self._buffer) >= self.chunk_size:
+            chunks.append(self._seal(bytes(self._buffer[:self.chunk_size]), last=False))
+            del self._buffer[:self.chunk_size]
+        return chunks
+
+    def finalize(self) -> bytes:
+        """Seal the remaining (always shorter than chunk_size) data as the last chunk"""
+        chunk = self._seal(bytes(self._buffer), last=True)
+        self._buffer.clear()
+        return chunk
+
+
+class AttachmentHeader:
+    """Parsed header of an encrypted attachment blob"""
+
+    # Enough to read any header produced by AttachmentEncryptor in one ranged read
+    MAX_SIZE = _ATTACHMENT_HEADER.size + 256
+
+    def __init__(self, data: bytes):
+        if len(data) < _ATTACHMENT_HEADER.size:
+            raise ValueError("Attachment is truncated")
+        magic, self.key_version, self.chunk_size, self.nonce_prefix, wrapped_key_len = (
+            _ATTACHMENT_HEADER.unpack(data[:_ATTACHMENT_HEADER.size])
+        )
+        if magic != _ATTACHMENT_MAGIC:
+            raise ValueError("Not an encrypted attachment")
+
+        self.size = _ATTACHMENT_HEADER.size + wrapped_key_len
+        if len(data) < self.size:
+            raise ValueError("Attachment is truncated")
+        self.raw = bytes(data[:self.size])
+        self.frame_size = self.chunk_size + _TAG_SIZE
+
+    def cipher(self) -> AESGCM:
+        return AESGCM(SecretEncryption.decrypt_key(self.raw[_ATTACHMENT_HEADER.size:], self.key_version))
+
+    def frame_offset(self, index: int) -> int:
+        return self.size + index * self.frame_size
+
+    def decrypt_frame(self, aesgcm: AESGCM, index: int, frame: bytes, last: bool) -> bytes:
+        return aesgcm.decrypt(_chunk_nonce(self.nonce_prefix, index, last), frame, self.raw)
+
+
+def decrypt_attachment(stream: Iterable[bytes]) -> Iterator[bytes]:
+    """Decrypt an AttachmentEncryptor stream chunk by chunk"""
+    blocks = iter(stream)
+    buffer = bytearray()
+
+    def fill(size: int) -> bool:
+        while len(buffer) < size:
+            block = next(blocks, None)
+            if block is None:
+                return False
+            buffer.extend(block)
+        return True
+
+    fill(AttachmentHeader.MAX_SIZE)
+    header = AttachmentHeader(bytes(buffer[:AttachmentHeader.MAX_SIZE]))
+    del buffer[:header.size]
+    aesgcm = header.cipher()
+
+    # Full-size frames are never last; the last frame is always shorter
+    counter = 0
+    while fill(header.frame_size):
+        yield header.decrypt_frame(aesgcm, counter, bytes(buffer[:header.frame_size]), last=False)
+        del buffer[:header.frame_size]
+        counter += 1
+
+    if len(buffer) < _TAG_SIZE:
+        raise ValueError("Attachment is truncated")
+    yield header.decrypt_frame(aesgcm, counter, bytes(buffer), last=True)
+
+
+def attachment_range(header: AttachmentHeader, plaintext_size: int, start: int, end: int) -> Tuple[int, int]:
+    """Ciphertext byte range [offset, limit) holding plaintext bytes start..end (inclusive)"""
+    last_index = plaintext_size // header.chunk_size
+    end_index = end // header.chunk_size
+    limit = header.frame_offset(end_index) + header.frame_size
+    if end_index == last_index:
+        limit = header.frame_offset(last_index) + plaintext_size - last_index * header.chunk_size + _TAG_SIZE
+    return header.frame_offset(start // header.chunk_size), limit
+
+
+def decrypt_attachment_range(
+    header: AttachmentHeader,
+    stream: Iterable[bytes],
+    plaintext_size: int,
+    start: int,
+    end: int,
+) -> Iterator[bytes]:
+    """Decrypt plaintext bytes start..end (inclusive) from the frames returned for attachment_range"""
+    last_index = plaintext_size // header.chunk_size
+    first_index = start // header.chunk_size
+    end_index = end // header.chunk_size
+    aesgcm = header.cipher()
+    blocks = iter(stream)
+    buffer = bytearray()
+
+    for index in range(first_index, end_index + 1):
+        last = index == last_index
+        frame_size = (plaintext_size - index * header.chunk_size + _TAG_SIZE) if last else header.frame_size
+        while len(buffer) < frame_size:
+            block = next(blocks, None)
+            if block is None:
+                raise ValueError("Attachment is truncated")
+            buffer.extend(block)
+
+        chunk = header.decrypt_frame(aesgcm, index, bytes(buffer[:frame_size]), last)
+        del buffer[:frame_size]
+
+        chunk_start = index * header.chunk_size
+        yield chunk[max(start - chunk_start, 0):end - chunk_start + 1]
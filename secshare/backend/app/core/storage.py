@@ -0,0 +1,193 @@
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+from app.core.config import settings
+
+READ_BLOCK_SIZE = 256 * 1024
+
+
+class BlobWriter(ABC):
+    """Incremental writer for one blob; nothing is visible until commit()"""
+
+    @abstractmethod
+    def write(self, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def commit(self) -> None:
+        ...
+
+    @abstractmethod
+    def abort(self) -> None:
+        ...
+
+
+class BlobStore(ABC):
+    """Storage for encrypted attachment bytes, addressed by Secret.attachment_url"""
+
+    @abstractmethod
+    def writer(self, key: str) -> BlobWriter:
+        ...
+
+    @abstractmethod
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes of [start, end) of a blob, or to its end if end is None"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete a blob; deleting a missing blob is not an error"""
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, path: str):
+        self._path = path
+        # Unique per writer, so concurrent writes of one key can't interleave
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        self._file = open(self._tmp_path, "wb")
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def commit(self) -> None:
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        if os.sep in key or key in ("", ".", ".."):
+            raise ValueError(f"Invalid blob key {key!r}")
+        return os.path.join(self.root, key)
+
+    def writer(self, key: str) -> BlobWriter:
+        return LocalBlobWriter(self.path(key))
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self.path(key), "rb", buffering=0) as f:
+            offset = start
+            while end is None or offset < end:
+                size = READ_BLOCK_SIZE if end is None else min(READ_BLOCK_SIZE, end - offset)
+                block = os.pread(f.fileno(), size, offset)
+                if not block:
+                    break
+                offset += len(block)
+                yield block
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobWriter(BlobWriter):
+    """Multipart upload that buffers at most one part in memory"""
+
+    def __init__(self, client, bucket: str, key: str, part_size: int):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts = []
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self._client.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= self._part_size:
+            self._upload_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+
+    def commit(self) -> None:
+        if self._upload_id is None:
+            # Small blob: a single PUT is cheaper than a multipart upload
+            self._client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer))
+            return
+
+        if self._buffer:
+            self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts}
+        )
+
+    def abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+            )
+
+
+class S3BlobStore(BlobStore):
+    """S3-compatible backend (AWS S3, MinIO)"""
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, part_size: int = 8 * 1024 * 1024):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("boto3 is required for ATTACHMENT_STORAGE_BACKEND=s3")
+
+        self.bucket = bucket
+        self.part_size = part_size
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=settings.S3_REGION or None,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+        )
+
+    def writer(self, key: str) -> BlobWriter:
+        return S3BlobWriter(self._client, self.bucket, key, self.part_size)
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        body = self._client.get_object(Bucket=self.bucket, Key=key, **kwargs)["Body"]
+        try:
+            yield from body.iter_chunks(READ_BLOCK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=key)
+
+
+def create_blob_store() -> BlobStore:
+    if settings.ATTACHMENT_STORAGE_BACKEND == "s3":
+        return S3BlobStore(
+            settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            part_size=settings.S3_PART_SIZE,
+        )
+    return LocalBlobStore(settings.ATTACHMENT_STORAGE_PATH)
+
+
+blob_store = create_blob_store()
@@ -0,0 +1,77 @@
+from typing import AsyncIterator, List, Optional
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+
+class MultipartFileStream:
+    """Yields the bytes of one file field of a multipart request as they arrive.
+
+    Unlike Request.form(), nothing is spooled to memory or disk, so the caller
+    can process arbitrarily large uploads in constant memory.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Expected a multipart/form-data request")
+
+        self.filename: Optional[str] = None
+        self._request = request
+        self._field_name = field_name
+        self._pending: List[bytes] = []
+        self._in_field = False
+        self._found = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_field = not self._found and name == self._field_name and b"filename" in options
+        if self._in_field:
+            self._found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._in_field = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._request.stream():
+            self._parser.write(chunk)
+            if self._pending:
+                pending, self._pending = self._pending, []
+                for data in pending:
+                    yield data
+        self._parser.finalize()
+
+        if not self._found:
+            raise ValueError(f"Missing file field '{self._field_name}'")
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """In-process queue that hands events to `write` in batches off the request path.
+
+    A batch is flushed once flush_max_events are queued or flush_interval_ms
+    has passed, whichever comes first. Events beyond max_events, and batches
+    whose write fails, are dropped and counted rather than blocking callers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[List[Any]], Awaitable[Any]],
+        flush_interval_ms: int,
+        flush_max_events: int,
+        max_events: int,
+    ):
+        self.name = name
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_events = flush_max_events
+        self.max_events = max_events
+        self._write = write
+
+        self._events: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._flushed_events = 0
+        self._batch_size_max = 0
+        self._flush_seconds_total = 0.0
+        self._flush_seconds_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def add(self, event: Any) -> None:
+        if len(self._events) >= self.max_events:
+            self._dropped += 1
+            return
+
+        self._events.append(event)
+        self._enqueued += 1
+        if len(self._events) >= self.flush_max_events:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the background task"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._events:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        batch = [self._events.popleft() for _ in range(min(len(self._events), self.flush_max_events))]
+        started = time.perf_counter()
+        try:
+            await self._write(batch)
+            self._written += len(batch)
+        except Exception:
+            logger.exception("%s: dropping %d events after a failed write", self.name, len(batch))
+            self._dropped += len(batch)
+
+        elapsed = time.perf_counter() - started
+        self._flushes += 1
+        self._flushed_events += len(batch)
+        self._flush_seconds_total += elapsed
+        self._flush_seconds_max = max(self._flush_seconds_max, elapsed)
+        self._batch_size_max = max(self._batch_size_max, len(batch))
+
+    def stats(self) -> dict:
+        flushes = self._flushes or 1
+        return {
+            "running": self.running,
+            "queue_depth": len(self._events),
+            "enqueued": self._enqueued,
+            "written": self._written,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "batch_size_avg": self._flushed_events / flushes,
+            "batch_size_max": self._batch_size_max,
+            "flush_seconds_avg": self._flush_seconds_total / flushes,
+            "flush_seconds_max": self._flush_seconds_max,
+        }
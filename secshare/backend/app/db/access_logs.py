@@ -0,0 +1,48 @@
+from typing import List
+from sqlalchemy import DateTime, String, column, insert, select, values
+from app.core.config import settings
+from app.core.write_behind import WriteBehindBuffer
+from app.db.access_stats import rollup_ctes
+from app.db.base import async_engine
+from app.models.access_log import AccessLog
+from app.models.secret import Secret
+
+
+async def write_access_logs(events: List[dict]) -> None:
+    """Insert a batch of access events in one multi-row statement.
+
+    Events for secrets deleted since they were queued are skipped, so one
+    burned secret can't fail the FK check for the whole batch. The same
+    statement adds the batch to the access stats rollups.
+    """
+    data = values(
+        column("id", String),
+        column("secret_id", String),
+        column("ip_address", String),
+        column("user_agent", String),
+        column("accessed_at", DateTime(timezone=True)),
+        name="events",
+    ).data([
+        (event["id"], event["secret_id"], event["ip_address"], event["user_agent"], event["accessed_at"])
+        for event in events
+    ])
+
+    live = select(data).join(Secret, Secret.id == data.c.secret_id).cte("live_events")
+    stmt = insert(AccessLog).from_select(
+        ["id", "secret_id", "ip_address", "user_agent", "accessed_at"],
+        select(live)
+    ).add_cte(*rollup_ctes(live))
+
+    async with async_engine.begin() as conn:
+        await conn.execute(stmt)
+
+
+# Only started by the app when ACCESS_LOG_WRITE_BEHIND is on; otherwise
+# get_secret writes the log row in the same statement as the view
+access_log_buffer = WriteBehindBuffer(
+    "access-logs",
+    write_access_logs,
+    flush_interval_ms=settings.ACCESS_LOG_FLUSH_INTERVAL_MS,
+    flush_max_events=settings.ACCESS_LOG_FLUSH_MAX_EVENTS,
+    max_events=settings.ACCESS_LOG_BUFFER_MAX_EVENTS,
+)
@@ -0,0 +1,128 @@
+"""Access statistics served from rollup tables instead of access_logs.
+
+Every statement that writes access_logs rows also upserts them into
+per-secret rollups (views per UTC hour, per IP address and per user agent)
+through rollup_ctes(), so reading stats costs a few index lookups no
+matter how often a secret was viewed. Hourly rows are trimmed to the
+access_logs retention by app.jobs.access_log_partitions.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.access_stats import SecretAccessAgent, SecretAccessHourly, SecretAccessIP
+
+TOP_USER_AGENTS = 10
+# Longer user agents are cut so one client can't produce an unindexable key
+USER_AGENT_MAX_LENGTH = 256
+
+
+def rollup_ctes(events) -> List:
+    """Upserts adding a batch of access events to the rollups, as CTEs.
+
+    `events` must have secret_id, ip_address, user_agent and accessed_at
+    columns. Events are grouped first, so each rollup row is touched once
+    per statement no matter how many events share it.
+    """
+    keyed = select(
+        events.c.secret_id,
+        events.c.ip_address,
+        func.left(func.coalesce(events.c.user_agent, ""), USER_AGENT_MAX_LENGTH).label("user_agent"),
+        events.c.accessed_at,
+        func.date_trunc("hour", events.c.accessed_at, "UTC").label("hour"),
+    ).subquery("keyed")
+
+    hourly = insert(SecretAccessHourly).from_select(
+        ["secret_id", "hour", "views"],
+        select(keyed.c.secret_id, keyed.c.hour, func.count())
+        .group_by(keyed.c.secret_id, keyed.c.hour)
+        .order_by(keyed.c.secret_id, keyed.c.hour)
+    )
+    hourly = hourly.on_conflict_do_update(
+        index_elements=["secret_id", "hour"],
+        set_={"views": SecretAccessHourly.views + hourly.excluded.views}
+    )
+
+    ips = insert(SecretAccessIP).from_select(
+        ["secret_id", "ip_address", "views", "last_accessed_at"],
+        select(keyed.c.secret_id, keyed.c.ip_address, func.count(), func.max(keyed.c.accessed_at))
+        .group_by(keyed.c.secret_id, keyed.c.ip_address)
+        .order_by(keyed.c.secret_id, keyed.c.ip_address)
+    )
+    ips = ips.on_conflict_do_update(
+        index_elements=["secret_id", "ip_address"],
+        set_={
+            "views": SecretAccessIP.views + ips.excluded.views,
+            "last_accessed_at": func.greatest(SecretAccessIP.last_accessed_at, ips.excluded.last_accessed_at),
+        }
+    )
+
+    agents = insert(SecretAccessAgent).from_select(
+        ["secret_id", "user_agent", "views"],
+        select(keyed.c.secret_id, keyed.c.user_agent, func.count())
+        .group_by(keyed.c.secret_id, keyed.c.user_agent)
+        .order_by(keyed.c.secret_id, keyed.c.user_agent)
+    )
+    agents = agents.on_conflict_do_update(
+        index_elements=["secret_id", "user_agent"],
+        set_={"views": SecretAccessAgent.views + agents.excluded.views}
+    )
+
+    return [hourly.cte("hourly_rollup"), ips.cte("ip_rollup"), agents.cte("agent_rollup")]
+
+
+def dense_buckets(views: Dict[datetime, int], start: datetime, count: int, step: timedelta) -> List[dict]:
+    return [{"start": start + i * step, "views": views.get(start + i * step, 0)} for i in range(count)]
+
+
+async def get_access_stats(db: AsyncSession, secret_ids, hours: int, days: int) -> dict:
+    """Stats summed over the secrets selected by `secret_ids` (a SELECT of ids)"""
+    now = datetime.now(timezone.utc)
+    this_hour = now.replace(minute=0, second=0, microsecond=0)
+    today = this_hour.replace(hour=0)
+    first_hour = this_hour - timedelta(hours=hours - 1)
+    first_day = today - timedelta(days=days - 1)
+
+    result = await db.execute(
+        select(SecretAccessHourly.hour, func.sum(SecretAccessHourly.views))
+        .where(
+            SecretAccessHourly.secret_id.in_(secret_ids),
+            SecretAccessHourly.hour >= min(first_hour, first_day)
+        )
+        .group_by(SecretAccessHourly.hour)
+    )
+    hourly: Dict[datetime, int] = {}
+    daily: Dict[datetime, int] = {}
+    for hour, views in result:
+        hour = hour.astimezone(timezone.utc)
+        hourly[hour] = views
+        day = hour.replace(hour=0)
+        daily[day] = daily.get(day, 0) + views
+
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(SecretAccessIP.views), 0),
+            func.count(func.distinct(SecretAccessIP.ip_address))
+        ).where(SecretAccessIP.secret_id.in_(secret_ids))
+    )
+    total_views, unique_ips = result.one()
+
+    views = func.sum(SecretAccessAgent.views)
+    result = await db.execute(
+        select(SecretAccessAgent.user_agent, views)
+        .where(SecretAccessAgent.secret_id.in_(secret_ids))
+        .group_by(SecretAccessAgent.user_agent)
+        .order_by(views.desc(), SecretAccessAgent.user_agent)
+        .limit(TOP_USER_AGENTS)
+    )
+
+    return {
+        "total_views": total_views,
+        "unique_ips": unique_ips,
+        "hourly": dense_buckets(hourly, first_hour, hours, timedelta(hours=1)),
+        "daily": dense_buckets(daily, first_day, days, timedelta(days=1)),
+        "top_user_agents": [{"user_agent": agent, "views": count} for agent, count in result],
+    }
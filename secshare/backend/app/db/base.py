@@ -1,11 +1,47 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.db.pool import PoolMetrics, instrument_engine, instrumented_pool_class, pool_stats
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+def pool_options(pool_class, metrics: PoolMetrics) -> dict:
+    return {
+        "poolclass": instrumented_pool_class(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+sync_pool_metrics = PoolMetrics()
+engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args=(
+        {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+        if settings.DB_STATEMENT_TIMEOUT_MS else {}
+    ),
+    **pool_options(QueuePool, sync_pool_metrics)
+)
+instrument_engine(engine, sync_pool_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+    connect_args=(
+        {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+        if settings.DB_STATEMENT_TIMEOUT_MS else {}
+    ),
+    **pool_options(AsyncAdaptedQueuePool, async_pool_metrics)
+)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -15,3 +51,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def db_pool_stats() -> dict:
+    return {
+        "sync": pool_stats(engine.pool, sync_pool_metrics),
+        "async": pool_stats(async_engine.pool, async_pool_metrics),
+    }
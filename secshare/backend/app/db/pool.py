@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Type
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+
+class PoolMetrics:
+    """Counters for one connection pool, shared by every pool it recreates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.pre_ping_failures = 0
+        self.connects = 0
+
+    def record_wait(self, seconds: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if overflowed:
+                self.overflow_events += 1
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def instrumented_pool_class(pool_class: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """Subclass a queue pool so checkout wait time and overflow are recorded"""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            overflow_before = self._overflow
+            try:
+                record = super()._do_get()
+            except exc.TimeoutError:
+                metrics.increment("timeouts")
+                raise
+            overflowed = self._overflow > max(overflow_before, 0)
+            metrics.record_wait(time.perf_counter() - started, overflowed)
+            return record
+
+    InstrumentedPool.metrics = metrics
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def instrument_engine(engine: Engine, metrics: PoolMetrics) -> None:
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        # Checkout only raises DisconnectionError when the pre-ping fails
+        if isinstance(exception, exc.DisconnectionError):
+            metrics.increment("pre_ping_failures")
+
+
+def pool_stats(pool: Pool, metrics: PoolMetrics) -> dict:
+    checkouts = metrics.checkouts or 1
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "connects": metrics.connects,
+        "checkouts": metrics.checkouts,
+        "wait_seconds_avg": metrics.wait_seconds_total / checkouts,
+        "wait_seconds_max": metrics.wait_seconds_max,
+        "overflow_events": metrics.overflow_events,
+        "timeouts": metrics.timeouts,
+        "pre_ping_failures": metrics.pre_ping_failures,
+    }
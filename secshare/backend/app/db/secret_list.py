@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.pagination import encode_cursor
+from app.models.secret import Secret
+
+
+async def list_live_secrets(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    after: Optional[Tuple[datetime, str]] = None,
+) -> Tuple[List[Secret], Optional[str]]:
+    """One page of a user's unexpired secrets, newest first, and the next page's cursor"""
+    query = select(Secret).where(
+        Secret.created_by_id == user_id,
+        Secret.expires_at > datetime.now(timezone.utc)
+    )
+    if after:
+        query = query.where(tuple_(Secret.created_at, Secret.id) < after)
+
+    result = await db.execute(
+        query.order_by(Secret.created_at.desc(), Secret.id.desc()).limit(limit + 1)
+    )
+    secrets = result.scalars().all()
+
+    if len(secrets) <= limit:
+        return secrets, None
+    secrets = secrets[:limit]
+    return secrets, encode_cursor(secrets[-1].created_at, secrets[-1].id)
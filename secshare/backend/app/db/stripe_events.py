@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.stripe_event import StripeEvent
+
+HANDLED_EVENTS = (
+    "checkout.session.completed",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+)
+
+
+def subscription_key(event: dict) -> str:
+    """Stripe subscription id the event applies to, used to order its processing"""
+    obj = event["data"]["object"]
+    if event["type"] == "checkout.session.completed":
+        return obj.get("subscription") or event["id"]
+    return obj["id"]
+
+
+async def record_event(db: AsyncSession, event: dict) -> bool:
+    """Store a verified webhook event once; returns False for ignored event types"""
+    if event["type"] not in HANDLED_EVENTS:
+        return False
+
+    await db.execute(
+        insert(StripeEvent)
+        .values(
+            id=event["id"],
+            type=event["type"],
+            subscription_key=subscription_key(event),
+            created=datetime.fromtimestamp(event["created"], timezone.utc),
+            payload=event["data"]["object"]
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    await db.commit()
+    return True
@@ -0,0 +1,167 @@
+"""Monthly usage counters kept in Redis.
+
+Each user has one hash per calendar month (usage:<user_id>:<YYYY-MM>) that
+is only ever changed with HINCRBY, so concurrent requests never contend on
+a Postgres row. The first touch in a month seeds the hash once from
+usage_stats. Every increment also adds the user to that month's dirty set,
+and app.jobs.reconcile_usage writes dirty users back to usage_stats.
+
+If Redis is unavailable, reads fall back to the last reconciled usage_stats
+row and increments are logged and dropped, so views and creates keep working.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import async_redis_client, redis_client
+from app.models.usage_stats import UsageStats
+
+logger = logging.getLogger(__name__)
+
+USAGE_FIELDS = ("secrets_created_this_month", "secret_requests_this_month", "attachment_bytes_this_month")
+
+# KEYS: counters hash, dirty set. ARGV: field, delta pairs, then expire-at and
+# user id. Returns whether the hash had already been seeded.
+INCREMENT_SCRIPT = """
+local seeded = redis.call('HEXISTS', KEYS[1], 'seeded')
+for i = 1, #ARGV - 2, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIREAT', KEYS[1], ARGV[#ARGV - 1])
+redis.call('SADD', KEYS[2], ARGV[#ARGV])
+redis.call('EXPIREAT', KEYS[2], ARGV[#ARGV - 1])
+return seeded
+"""
+
+# KEYS: counters hash. ARGV: field, baseline pairs, then expire-at. Adds the
+# usage_stats baseline exactly once, even if increments got there first.
+SEED_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], 'seeded', 1) == 1 then
+    for i = 1, #ARGV - 1, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    redis.call('EXPIREAT', KEYS[1], ARGV[#ARGV])
+end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+increment_script = redis_client.register_script(INCREMENT_SCRIPT)
+seed_script = redis_client.register_script(SEED_SCRIPT)
+async_increment_script = async_redis_client.register_script(INCREMENT_SCRIPT)
+async_seed_script = async_redis_client.register_script(SEED_SCRIPT)
+
+
+def current_period(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Start and end of the calendar month (UTC) that usage is counted in"""
+    now = now or datetime.now(timezone.utc)
+    start = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    if now.month == 12:
+        end = datetime(now.year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(now.year, now.month + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def usage_key(user_id: str, period_start: datetime) -> str:
+    return f"usage:{user_id}:{period_start:%Y-%m}"
+
+
+def dirty_key(period_start: datetime) -> str:
+    return f"usage:dirty:{period_start:%Y-%m}"
+
+
+def expire_at(period_end: datetime) -> int:
+    return int((period_end + timedelta(days=settings.USAGE_COUNTER_RETENTION_DAYS)).timestamp())
+
+
+def counts(values: Dict[str, str]) -> Dict[str, int]:
+    return {field: int(values.get(field, 0)) for field in USAGE_FIELDS}
+
+
+def baseline_query(user_id: str, period_start: datetime):
+    """usage_stats counters, if the row already belongs to this period"""
+    return select(*(getattr(UsageStats, field) for field in USAGE_FIELDS)).where(
+        UsageStats.user_id == user_id,
+        UsageStats.period_start >= period_start
+    )
+
+
+def seed_args(row, period_end: datetime) -> List:
+    args = []
+    for i, field in enumerate(USAGE_FIELDS):
+        args += [field, row[i] if row else 0]
+    return args + [expire_at(period_end)]
+
+
+def increment_args(user_id: str, deltas: Dict[str, int], period_end: datetime) -> List:
+    args = []
+    for field, delta in deltas.items():
+        args += [field, delta]
+    return args + [expire_at(period_end), user_id]
+
+
+def pairs(flat: List[str]) -> Dict[str, str]:
+    return dict(zip(flat[::2], flat[1::2]))
+
+
+def get_usage_counts(db: Session, user_id: str) -> Dict[str, int]:
+    start, end = current_period()
+    key = usage_key(user_id, start)
+    try:
+        values = redis_client.hgetall(key)
+        if "seeded" not in values:
+            row = db.execute(baseline_query(user_id, start)).first()
+            values = pairs(seed_script(keys=[key], args=seed_args(row, end)))
+        return counts(values)
+    except redis.RedisError:
+        logger.exception("Usage counters unavailable, reading usage_stats instead")
+        usage = db.query(UsageStats).filter(UsageStats.user_id == user_id).first()
+        return {field: getattr(usage, field) if usage else 0 for field in USAGE_FIELDS}
+
+
+async def get_usage_counts_async(db: AsyncSession, user_id: str) -> Dict[str, int]:
+    start, end = current_period()
+    key = usage_key(user_id, start)
+    try:
+        values = await async_redis_client.hgetall(key)
+        if "seeded" not in values:
+            row = (await db.execute(baseline_query(user_id, start))).first()
+            values = pairs(await async_seed_script(keys=[key], args=seed_args(row, end)))
+        return counts(values)
+    except redis.RedisError:
+        logger.exception("Usage counters unavailable, reading usage_stats instead")
+        result = await db.execute(select(UsageStats).where(UsageStats.user_id == user_id))
+        usage = result.scalar_one_or_none()
+        return {field: getattr(usage, field) if usage else 0 for field in USAGE_FIELDS}
+
+
+def increment_usage(db: Session, user_id: str, **deltas: int) -> None:
+    start, end = current_period()
+    key = usage_key(user_id, start)
+    try:
+        seeded = increment_script(keys=[key, dirty_key(start)], args=increment_args(user_id, deltas, end))
+        if not seeded:
+            row = db.execute(baseline_query(user_id, start)).first()
+            seed_script(keys=[key], args=seed_args(row, end))
+    except redis.RedisError:
+        logger.exception("Dropping usage increment %s for user %s", deltas, user_id)
+
+
+async def increment_usage_async(db: AsyncSession, user_id: str, **deltas: int) -> None:
+    start, end = current_period()
+    key = usage_key(user_id, start)
+    try:
+        seeded = await async_increment_script(
+            keys=[key, dirty_key(start)], args=increment_args(user_id, deltas, end)
+        )
+        if not seeded:
+            row = (await db.execute(baseline_query(user_id, start))).first()
+            await async_seed_script(keys=[key], args=seed_args(row, end))
+    except redis.RedisError:
+        logger.exception("Dropping usage increment %s for user %s", deltas, user_id)
@@ -0,0 +1,143 @@
+"""Create upcoming monthly access_logs partitions and drop expired ones.
+
+access_logs is range-partitioned by accessed_at month into tables named
+access_logs_YYYY_MM. Partitions are created ACCESS_LOG_PARTITIONS_AHEAD
+months in advance, so inserts never need DDL. Rows for a month without a
+partition land in access_logs_default instead of failing; they are moved
+into the month's partition when it is created, with a warning, since it
+means maintenance fell behind.
+
+Whole partitions older than ACCESS_LOG_RETENTION_MONTHS are detached and
+then dropped instead of being DELETEd row by row, and hourly access
+rollups older than that are deleted. DETACH ... CONCURRENTLY isn't allowed
+while a default partition exists, so DDL on the parent runs with a short
+lock_timeout and is retried on a later pass rather than queueing behind
+long queries and stalling inserts. The expiry sweeper calls maintain() on
+every pass.
+
+Usage: python -m app.jobs.access_log_partitions
+"""
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import delete, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.db.base import engine
+from app.models.access_stats import SecretAccessHourly
+
+PARTITION_NAME = re.compile(r"^access_logs_(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "access_logs_default"
+# How long DDL may wait for its lock on access_logs before giving up
+LOCK_TIMEOUT = "2s"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"access_logs_{month.year:04d}_{month.month:02d}"
+
+
+def existing_partitions(conn) -> List[str]:
+    return list(conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'access_logs'
+    """)).scalars())
+
+
+def create_partition(conn, month: date) -> int:
+    """Create a month's partition, moving its rows out of the default partition; returns rows moved"""
+    name, start, end = partition_name(month), month.isoformat(), add_months(month, 1).isoformat()
+    conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+
+    stray = conn.execute(text(
+        f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE accessed_at >= :start AND accessed_at < :end"
+    ), {"start": start, "end": end}).scalar()
+    if not stray:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF access_logs "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+        return 0
+
+    # The default partition may not hold rows of a partition being created,
+    # so build the table, move them and attach it in one transaction
+    conn.execute(text(f"CREATE TABLE {name} (LIKE access_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE accessed_at >= :start AND accessed_at < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end})
+    conn.execute(text(
+        f"ALTER TABLE access_logs ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    return stray
+
+
+def drop_partition(name: str) -> bool:
+    """Detach a partition, then drop it once it no longer locks the parent"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            conn.execute(text(f"ALTER TABLE access_logs DETACH PARTITION {name}"))
+    except OperationalError as exc:
+        print(f"Could not detach partition {name}, retrying next pass: {exc.orig}")
+        return False
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    return True
+
+
+def maintain(today: Optional[date] = None) -> None:
+    """Ensure partitions up to ACCESS_LOG_PARTITIONS_AHEAD exist and apply retention"""
+    today = today or datetime.now(timezone.utc).date()
+    current = today.replace(day=1)
+    oldest_kept = add_months(current, -settings.ACCESS_LOG_RETENTION_MONTHS)
+
+    with engine.begin() as conn:
+        existing = set(existing_partitions(conn))
+
+    # Each DDL statement in its own transaction keeps the parent's lock short
+    for offset in range(settings.ACCESS_LOG_PARTITIONS_AHEAD + 1):
+        month = add_months(current, offset)
+        if partition_name(month) not in existing:
+            try:
+                with engine.begin() as conn:
+                    moved = create_partition(conn, month)
+            except OperationalError as exc:
+                print(f"WARNING: could not create partition {partition_name(month)}: {exc.orig}")
+                continue
+            print(f"Created partition {partition_name(month)}")
+            if moved:
+                print(f"WARNING: moved {moved} access logs from {DEFAULT_PARTITION} into "
+                      f"{partition_name(month)}; partition maintenance had fallen behind")
+
+    for name in sorted(existing):
+        match = PARTITION_NAME.match(name)
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < oldest_kept:
+            if drop_partition(name):
+                print(f"Dropped partition {name}")
+
+    # Hourly access rollups follow the same retention as the logs themselves
+    with engine.begin() as conn:
+        trimmed = conn.execute(
+            delete(SecretAccessHourly).where(SecretAccessHourly.hour < oldest_kept)
+        ).rowcount
+    if trimmed:
+        print(f"Trimmed {trimmed} hourly access rollups")
+
+
+if __name__ == "__main__":
+    maintain()
@@ -0,0 +1,226 @@
+"""Reconcile subscription plans and statuses with Stripe.
+
+Webhooks and /subscriptions/sync update rows one at a time; this job
+catches whatever they missed. It loads every row with a Stripe
+subscription id, pages through all of Stripe's subscriptions (any status,
+100 per request, at most STRIPE_RECONCILE_REQUESTS_PER_SECOND requests and
+backing off when rate limited), joins the two in memory on the
+subscription id and writes the rows that differ with one
+UPDATE ... FROM (VALUES ...) per batch. A row is only written if its plan
+and status are still what was loaded, so a webhook applied meanwhile wins.
+
+Run it nightly with --once, e.g. from a cron schedule. STRIPE_API_BASE
+points it at a local Stripe stand-in instead.
+
+Usage: python -m app.jobs.reconcile_stripe [--once] [--interval S] [--batch-size N] [--dry-run]
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import DateTime, String, cast, column, select, update, values
+from sqlalchemy.engine import Row
+
+from app.api.deps import invalidate_principal
+from app.core.config import settings
+from app.core.payments import stripe
+from app.core.plans import plan_for_price
+from app.db.base import engine
+from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus
+
+PAGE_SIZE = 100  # Stripe's maximum
+RATE_LIMIT_RETRIES = 5
+
+# Stripe statuses not listed here ("incomplete", "paused") leave the row as it is
+STATUSES = {
+    "active": SubscriptionStatus.ACTIVE,
+    "trialing": SubscriptionStatus.TRIALING,
+    "past_due": SubscriptionStatus.PAST_DUE,
+    "unpaid": SubscriptionStatus.PAST_DUE,
+    "canceled": SubscriptionStatus.CANCELED,
+    "incomplete_expired": SubscriptionStatus.CANCELED,
+}
+
+
+def load_subscriptions() -> Dict[str, Row]:
+    """Rows linked to a Stripe subscription, keyed by its id"""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(
+                Subscription.stripe_subscription_id,
+                Subscription.user_id,
+                Subscription.plan,
+                Subscription.status,
+                Subscription.stripe_price_id,
+                Subscription.stripe_current_period_end,
+            ).where(Subscription.stripe_subscription_id.is_not(None))
+        )
+        return {row.stripe_subscription_id: row for row in rows}
+
+
+def fetch_page(starting_after: Optional[str]) -> Any:
+    params = {"status": "all", "limit": PAGE_SIZE}
+    if starting_after:
+        params["starting_after"] = starting_after
+
+    for attempt in range(RATE_LIMIT_RETRIES):
+        try:
+            return stripe.Subscription.list(**params)
+        except stripe.error.RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def list_stripe_subscriptions(requests_per_second: float) -> Iterator[Any]:
+    """Every subscription in Stripe, whatever its status.
+
+    Paged by hand rather than with auto_paging_iter() so requests can be
+    spaced out to stay under Stripe's rate limit.
+    """
+    spacing = 1 / requests_per_second
+    starting_after = None
+    next_request = 0.0
+
+    while True:
+        delay = next_request - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_request = time.monotonic() + spacing
+
+        page = fetch_page(starting_after)
+        yield from page.data
+        if not page.has_more or not page.data:
+            return
+        starting_after = page.data[-1].id
+
+
+def changes_for(row: Row, stripe_sub: Any) -> Optional[tuple]:
+    """VALUES row bringing `row` in line with Stripe, or None if it already is"""
+    status = STATUSES.get(stripe_sub.status)
+    if status is None:
+        return None
+
+    items = stripe_sub["items"]["data"]
+    price_id = items[0]["price"]["id"] if items else row.stripe_price_id
+    if status == SubscriptionStatus.CANCELED:
+        plan = SubscriptionPlan.FREE
+    else:
+        # An unknown price (e.g. a retired one) keeps the current plan
+        plan = plan_for_price(price_id) or row.plan
+
+    period_end = row.stripe_current_period_end
+    if stripe_sub.get("current_period_end"):
+        period_end = datetime.fromtimestamp(stripe_sub["current_period_end"], timezone.utc)
+
+    if (plan, status, price_id, period_end) == (
+        row.plan, row.status, row.stripe_price_id, row.stripe_current_period_end
+    ):
+        return None
+    return (row.stripe_subscription_id, row.plan.value, row.status.value,
+            plan.value, status.value, price_id, period_end)
+
+
+def write_changes(rows: List[tuple]) -> List[Optional[str]]:
+    """Apply a batch of changes; returns the user ids of the rows written"""
+    data = values(
+        column("stripe_subscription_id", String),
+        column("old_plan", String),
+        column("old_status", String),
+        column("plan", String),
+        column("status", String),
+        column("stripe_price_id", String),
+        column("stripe_current_period_end", DateTime(timezone=True)),
+        name="changes",
+    ).data(rows)
+
+    plan_type = Subscription.plan.type
+    status_type = Subscription.status.type
+    stmt = (
+        update(Subscription)
+        .where(
+            Subscription.stripe_subscription_id == data.c.stripe_subscription_id,
+            Subscription.plan == cast(data.c.old_plan, plan_type),
+            Subscription.status == cast(data.c.old_status, status_type),
+        )
+        .values(
+            plan=cast(data.c.plan, plan_type),
+            status=cast(data.c.status, status_type),
+            stripe_price_id=data.c.stripe_price_id,
+            stripe_current_period_end=cast(data.c.stripe_current_period_end, DateTime(timezone=True)),
+        )
+        .returning(Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    with engine.begin() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def reconcile(batch_size: int, requests_per_second: float, dry_run: bool) -> Dict[str, int]:
+    local = load_subscriptions()
+    counts = {"checked": 0, "changed": 0, "written": 0, "unknown": 0}
+    pending: List[tuple] = []
+    user_ids: Set[str] = set()
+
+    def flush() -> None:
+        if pending and not dry_run:
+            written = write_changes(pending)
+            counts["written"] += len(written)
+            user_ids.update(user_id for user_id in written if user_id)
+        pending.clear()
+
+    for stripe_sub in list_stripe_subscriptions(requests_per_second):
+        counts["checked"] += 1
+        row = local.pop(stripe_sub.id, None)
+        if row is None:
+            # Not linked to a row yet, e.g. a checkout whose webhook is pending
+            counts["unknown"] += 1
+            continue
+
+        change = changes_for(row, stripe_sub)
+        if change:
+            counts["changed"] += 1
+            pending.append(change)
+            if len(pending) >= batch_size:
+                flush()
+    flush()
+
+    for user_id in user_ids:
+        invalidate_principal(user_id)
+
+    # Rows whose subscription Stripe didn't list, e.g. from another account
+    counts["missing"] = len(local)
+    return counts
+
+
+def run(once: bool, interval: int, batch_size: int, dry_run: bool) -> None:
+    while True:
+        started = time.monotonic()
+        counts = reconcile(batch_size, settings.STRIPE_RECONCILE_REQUESTS_PER_SECOND, dry_run)
+        print(
+            f"Checked {counts['checked']} Stripe subscriptions, {counts['changed']} changed, "
+            f"wrote {counts['written']}{' (dry run)' if dry_run else ''}, "
+            f"{counts['unknown']} not linked, {counts['missing']} rows not in Stripe "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Reconcile once and exit (for cron)")
+    parser.add_argument("--interval", type=int, default=settings.STRIPE_RECONCILE_INTERVAL_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=settings.STRIPE_RECONCILE_BATCH_SIZE,
+                        help="Rows written per UPDATE")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    args = parser.parse_args()
+
+    run(args.once, args.interval, args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Write Redis usage counters back to usage_stats.
+
+Each pass first moves usage_stats rows from earlier months to the current
+one with zeroed counters. It then pops users from the current month's
+dirty set in batches and copies their counters into usage_stats with one
+UPDATE ... FROM (VALUES ...) per batch. Counters are absolute, so running a
+batch twice is harmless. A batch whose write fails goes back into the
+dirty set.
+
+Usage: python -m app.jobs.reconcile_usage [--once] [--interval S] [--batch-size N]
+"""
+import argparse
+import time
+from typing import List
+
+from sqlalchemy import BigInteger, Integer, String, column, update, values
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.db.base import engine
+from app.db.usage import USAGE_FIELDS, counts, current_period, dirty_key, usage_key
+from app.models.usage_stats import UsageStats
+
+
+def roll_over_periods(period_start, period_end) -> int:
+    """Reset rows still counting an earlier month; returns how many were reset"""
+    stmt = (
+        update(UsageStats)
+        .where(UsageStats.period_start < period_start)
+        .values(
+            period_start=period_start,
+            period_end=period_end,
+            **{field: 0 for field in USAGE_FIELDS}
+        )
+    )
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount
+
+
+def write_counters(rows: List[tuple], period_start, period_end) -> int:
+    data = values(
+        column("user_id", String),
+        column("secrets_created_this_month", Integer),
+        column("secret_requests_this_month", Integer),
+        column("attachment_bytes_this_month", BigInteger),
+        name="counters",
+    ).data(rows)
+
+    # Rows already moved on to a later month keep their own counters
+    stmt = (
+        update(UsageStats)
+        .where(UsageStats.user_id == data.c.user_id, UsageStats.period_start < period_end)
+        .values(
+            period_start=period_start,
+            period_end=period_end,
+            **{field: data.c[field] for field in USAGE_FIELDS}
+        )
+        .execution_options(synchronize_session=False)
+    )
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount
+
+
+def reconcile(batch_size: int) -> int:
+    """Copy every dirty user's counters for the current month; returns rows written"""
+    period_start, period_end = current_period()
+    dirty = dirty_key(period_start)
+    written = 0
+
+    while True:
+        user_ids = redis_client.spop(dirty, batch_size)
+        if not user_ids:
+            return written
+
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(usage_key(user_id, period_start))
+        hashes = pipe.execute()
+
+        rows = []
+        unseeded = []
+        for user_id, counters in zip(user_ids, hashes):
+            # Unseeded counters are missing the usage_stats baseline; the
+            # request that incremented them seeds them right after
+            if "seeded" not in counters:
+                unseeded.append(user_id)
+                continue
+            row = counts(counters)
+            rows.append((user_id, *(row[field] for field in USAGE_FIELDS)))
+
+        if unseeded:
+            redis_client.sadd(dirty, *unseeded)
+
+        if rows:
+            try:
+                written += write_counters(rows, period_start, period_end)
+            except Exception:
+                redis_client.sadd(dirty, *(row[0] for row in rows))
+                raise
+
+        if len(user_ids) < batch_size:
+            return written
+
+
+def run(once: bool, interval: int, batch_size: int) -> None:
+    while True:
+        started = time.monotonic()
+        period_start, period_end = current_period()
+        reset = roll_over_periods(period_start, period_end)
+        written = reconcile(batch_size)
+        print(
+            f"Reconciled {written} usage rows, reset {reset} from earlier months "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Reconcile once and exit (for cron)")
+    parser.add_argument("--interval", type=int, default=settings.USAGE_RECONCILE_INTERVAL_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=settings.USAGE_RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    run(args.once, args.interval, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Re-wrap Secret.encrypted_key_bin under the active master key version.
+
+Rows are read in id-ordered keyset batches (WHERE id > last ORDER BY id
+LIMIT n), unwrapped/re-wrapped in worker processes and written back with
+one UPDATE ... FROM (VALUES ...) per batch. Every read and write is its own
+short transaction, so no snapshot stays open for the whole run. Progress
+is checkpointed to a file after each batch so an interrupted run resumes
+after the last written id.
+
+Attachment blobs can't be re-wrapped: their header, wrapped key included,
+is authenticated by every chunk. The run ends by listing the older master
+key versions live attachments still use; keep those in MASTER_KEYS until
+the secrets holding them are gone.
+
+Usage: python -m app.jobs.rewrap_keys [--batch-size N] [--workers N] [--checkpoint PATH]
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, LargeBinary, String, column, func, select, update, values
+
+from app.core.security import AttachmentHeader, SecretEncryption, master_keyring
+from app.core.storage import blob_store
+from app.db.base import engine
+from app.models.secret import Secret
+
+Row = Tuple[str, bytes, int]
+
+
+def rewrap_batch(rows: List[Row]) -> List[dict]:
+    """Unwrap each data key with its own version and wrap it with the active one"""
+    rewrapped = []
+    for secret_id, encrypted_key, key_version in rows:
+        key = SecretEncryption.decrypt_key(encrypted_key, key_version)
+        new_encrypted_key, new_version = SecretEncryption.encrypt_key(key)
+        rewrapped.append({
+            "id": secret_id,
+            "encrypted_key": new_encrypted_key,
+            "key_version": new_version,
+            "old_version": key_version,
+        })
+    return rewrapped
+
+
+def read_batch(pending, after: Optional[str], limit: int) -> List[Row]:
+    """Next batch of rows after `after` in id order, read in its own short transaction"""
+    query = (
+        select(Secret.id, Secret.encrypted_key_bin, Secret.key_version)
+        .where(pending)
+        .order_by(Secret.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(Secret.id > after)
+
+    with engine.connect() as conn:
+        return [
+            (row.id, bytes(row.encrypted_key_bin), row.key_version)
+            for row in conn.execute(query)
+        ]
+
+
+def write_batch(rewrapped: List[dict]) -> int:
+    """Apply a batch of re-wrapped keys in one statement and one short transaction"""
+    data = values(
+        column("id", String),
+        column("encrypted_key", LargeBinary),
+        column("key_version", Integer),
+        column("old_version", Integer),
+        name="rewrapped",
+    ).data([
+        (row["id"], row["encrypted_key"], row["key_version"], row["old_version"])
+        for row in rewrapped
+    ])
+
+    # Matching on the old version skips rows re-wrapped or replaced meanwhile
+    stmt = (
+        update(Secret)
+        .where(Secret.id == data.c.id, Secret.key_version == data.c.old_version)
+        .values(
+            encrypted_key_bin=data.c.encrypted_key,
+            key_version=data.c.key_version,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount
+
+
+def attachment_key_versions() -> Dict[Optional[int], int]:
+    """Number of live attachments per master key version (None: header unreadable)"""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(Secret.attachment_key_version, Secret.attachment_url)
+            .where(Secret.has_attachment.is_(True))
+        ).all()
+
+    counts: Dict[Optional[int], int] = {}
+    for version, blob_key in rows:
+        if version is None:
+            # Uploaded before the version was recorded; read it from the header
+            try:
+                version = AttachmentHeader(
+                    b"".join(blob_store.read(blob_key, 0, AttachmentHeader.MAX_SIZE))
+                ).key_version
+            except Exception as exc:
+                print(f"Could not read the header of attachment {blob_key}: {exc!r}")
+        counts[version] = counts.get(version, 0) + 1
+    return counts
+
+
+def load_checkpoint(path: str, version: int) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    # A checkpoint from a rotation to another version doesn't apply
+    if checkpoint.get("key_version") != version:
+        return None
+    return checkpoint.get("last_id")
+
+
+def save_checkpoint(path: str, last_id: str, version: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_id": last_id, "key_version": version}, f)
+    os.replace(tmp_path, path)
+
+
+def run(batch_size: int, workers: int, checkpoint_path: str) -> None:
+    target_version = master_keyring.active_version
+    last_id = load_checkpoint(checkpoint_path, target_version)
+
+    pending = Secret.key_version != target_version
+
+    with engine.connect() as conn:
+        remaining = pending if last_id is None else pending & (Secret.id > last_id)
+        total = conn.execute(select(func.count()).select_from(Secret).where(remaining)).scalar_one()
+
+    print(f"Re-wrapping {total} keys to master key version {target_version}"
+          + (f", resuming after {last_id}" if last_id else ""))
+
+    processed = 0
+    updated = 0
+    started = time.monotonic()
+
+    def drain(in_flight: deque) -> None:
+        nonlocal processed, updated
+        batch_last_id, future = in_flight.popleft()
+        rewrapped = future.result()
+        updated += write_batch(rewrapped) if rewrapped else 0
+        processed += len(rewrapped)
+        save_checkpoint(checkpoint_path, batch_last_id, target_version)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0.0
+        eta = (total - processed) / rate if rate else float("inf")
+        print(f"{processed}/{total} rows, {updated} updated, {rate:.0f} rows/s, ETA {eta:.0f}s")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight: deque = deque()
+        after = last_id
+
+        while True:
+            rows = read_batch(pending, after, batch_size)
+            if not rows:
+                break
+            after = rows[-1][0]
+            in_flight.append((after, pool.submit(rewrap_batch, rows)))
+
+            # Keep the workers busy while writing batches back in id order
+            if len(in_flight) >= workers * 2:
+                drain(in_flight)
+
+        while in_flight:
+            drain(in_flight)
+
+    print(f"Done: {processed} rows re-wrapped, {updated} updated in {time.monotonic() - started:.1f}s")
+
+    attachment_versions = attachment_key_versions()
+    unreadable = attachment_versions.pop(None, 0)
+    if unreadable:
+        print(f"{unreadable} attachments have no readable header and were not checked")
+    still_used = {
+        version: count for version, count in attachment_versions.items()
+        if version != target_version
+    }
+    if still_used:
+        print("Attachments still need older master keys; keep these versions in MASTER_KEYS "
+              "until their secrets are gone: "
+              + ", ".join(f"{version} ({count} attachments)" for version, count in still_used.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default="rewrap_keys.checkpoint.json")
+    args = parser.parse_args()
+
+    run(args.batch_size, args.workers, args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Apply Stripe webhook events recorded in the stripe_events inbox.
+
+The webhook endpoint only verifies and stores events, so a redelivered
+event is a no-op and Stripe never waits on our database or Stripe itself.
+This worker takes subscriptions with pending events, holds a transaction
+advisory lock per subscription so several workers can run side by side,
+and applies that subscription's events oldest first. An event older than
+one that already changed the same subscription is skipped rather than
+rolling the subscription back; checkout completions, which link the
+subscription in the first place, are always applied. A failing event is retried with exponential
+backoff and holds back newer events for its subscription until it succeeds
+or reaches STRIPE_EVENT_MAX_ATTEMPTS. It is then parked with failed_at set,
+never marked processed, so it stays visible until someone requeues it.
+
+Usage: python -m app.jobs.stripe_events [--once] [--interval S] [--batch-size N]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.api.deps import invalidate_principal
+from app.core.config import settings
+from app.core.payments import stripe
+from app.core.plans import plan_for_price
+from app.db.base import SessionLocal, engine
+from app.models.stripe_event import StripeEvent
+from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionStatus
+
+
+def apply_event(db: Session, event: StripeEvent) -> Optional[str]:
+    """Apply one event to its subscription; returns the affected user id"""
+    obj = event.payload
+
+    if event.type == "checkout.session.completed":
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == obj["metadata"]["user_id"]
+        ).first()
+
+        if subscription:
+            subscription.stripe_subscription_id = obj["subscription"]
+            subscription.status = SubscriptionStatus.ACTIVE
+
+            # Get the subscription details to determine the plan
+            stripe_sub = stripe.Subscription.retrieve(obj["subscription"])
+            plan = plan_for_price(stripe_sub["items"]["data"][0]["price"]["id"])
+            if plan:
+                subscription.plan = plan
+
+            return subscription.user_id
+
+    elif event.type == "customer.subscription.updated":
+        subscription = db.query(Subscription).filter(
+            Subscription.stripe_subscription_id == obj["id"]
+        ).first()
+
+        if subscription:
+            plan = plan_for_price(obj["items"]["data"][0]["price"]["id"])
+            if plan:
+                subscription.plan = plan
+
+            subscription.status = SubscriptionStatus.ACTIVE
+            return subscription.user_id
+
+    elif event.type == "customer.subscription.deleted":
+        subscription = db.query(Subscription).filter(
+            Subscription.stripe_subscription_id == obj["id"]
+        ).first()
+
+        if subscription:
+            subscription.plan = SubscriptionPlan.FREE
+            subscription.status = SubscriptionStatus.CANCELED
+            return subscription.user_id
+
+    return None
+
+
+def pending():
+    """Events still to be applied: neither processed nor parked"""
+    return and_(StripeEvent.processed_at.is_(None), StripeEvent.failed_at.is_(None))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff after a subscription's head event failed `attempts` times"""
+    seconds = settings.STRIPE_EVENT_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.STRIPE_EVENT_RETRY_MAX_SECONDS))
+
+
+def pending_subscriptions(limit: int) -> List[str]:
+    """Subscription keys with events due now, the longest waiting first"""
+    with engine.connect() as conn:
+        return list(conn.execute(
+            select(StripeEvent.subscription_key)
+            .where(pending())
+            .group_by(StripeEvent.subscription_key)
+            # Only a failed head event has next_attempt_at; it holds back the rest
+            .having(func.coalesce(func.max(StripeEvent.next_attempt_at), func.now()) <= func.now())
+            .order_by(func.min(StripeEvent.created))
+            .limit(limit)
+        ).scalars())
+
+
+def superseded(db: Session, event: StripeEvent) -> bool:
+    """Whether a newer event for the same subscription has already changed it"""
+    # Checkout links the subscription to its user; later events find nothing
+    # to change until it has run, so it is never skipped
+    if event.type == "checkout.session.completed":
+        return False
+
+    return db.execute(
+        select(StripeEvent.id).where(
+            StripeEvent.subscription_key == event.subscription_key,
+            StripeEvent.created > event.created,
+            StripeEvent.applied.is_(True)
+        ).limit(1)
+    ).first() is not None
+
+
+def process_subscription(key: str) -> Tuple[int, int, Set[str]]:
+    """Apply one subscription's pending events in order; returns (applied, failed, user ids)"""
+    applied = failed = 0
+    user_ids: Set[str] = set()
+
+    with SessionLocal() as db:
+        # Another worker has this subscription; it'll get to all of its events
+        if not db.execute(select(func.pg_try_advisory_xact_lock(func.hashtext(f"stripe_events:{key}")))).scalar():
+            return 0, 0, user_ids
+
+        events = db.query(StripeEvent).filter(
+            StripeEvent.subscription_key == key,
+            pending()
+        ).order_by(StripeEvent.created, StripeEvent.received_at, StripeEvent.id).all()
+
+        for event in events:
+            now = datetime.now(timezone.utc)
+            # Backing off; listed before another worker's failed attempt
+            if event.next_attempt_at is not None and event.next_attempt_at > now:
+                break
+
+            if superseded(db, event):
+                event.processed_at = now
+                continue
+
+            event.attempts += 1
+            try:
+                with db.begin_nested():
+                    user_id = apply_event(db, event)
+            except Exception as exc:
+                failed += 1
+                event.last_error = repr(exc)
+                print(f"Event {event.id} ({event.type}) failed, attempt {event.attempts}: {exc!r}")
+                if event.attempts < settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+                    break
+                # Park it so newer events for this subscription aren't stuck forever
+                print(f"Event {event.id} ({event.type}) parked after {event.attempts} attempts")
+                event.failed_at = now
+                event.next_attempt_at = None
+                continue
+
+            event.processed_at = now
+            event.applied = user_id is not None
+            event.last_error = None
+            event.next_attempt_at = None
+            applied += 1
+            if user_id:
+                user_ids.add(user_id)
+
+        db.commit()
+
+    return applied, failed, user_ids
+
+
+def purge_processed(retention_days: int) -> int:
+    """Forget events processed long enough ago that Stripe won't redeliver them"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    with engine.begin() as conn:
+        return conn.execute(
+            delete(StripeEvent).where(StripeEvent.processed_at < cutoff)
+        ).rowcount
+
+
+def lag_seconds() -> float:
+    """Age of the oldest pending event"""
+    with engine.connect() as conn:
+        oldest = conn.execute(select(func.min(StripeEvent.received_at)).where(pending())).scalar()
+    if oldest is None:
+        return 0.0
+    return max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds())
+
+
+def parked_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(StripeEvent).where(StripeEvent.failed_at.is_not(None))
+        ).scalar()
+
+
+def process(batch_size: int) -> Tuple[int, int]:
+    applied = failed = 0
+    for key in pending_subscriptions(batch_size):
+        key_applied, key_failed, user_ids = process_subscription(key)
+        applied += key_applied
+        failed += key_failed
+        for user_id in user_ids:
+            invalidate_principal(user_id)
+    return applied, failed
+
+
+def run(once: bool, interval: int, batch_size: int) -> None:
+    while True:
+        started = time.monotonic()
+        applied, failed = process(batch_size)
+        purged = purge_processed(settings.STRIPE_EVENT_RETENTION_DAYS)
+        if applied or failed or purged or once:
+            print(
+                f"Applied {applied} Stripe events, {failed} failed, purged {purged} "
+                f"in {time.monotonic() - started:.1f}s (lag {lag_seconds():.0f}s, {parked_count()} parked)"
+            )
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Process pending events once and exit")
+    parser.add_argument("--interval", type=int, default=settings.STRIPE_EVENT_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=settings.STRIPE_EVENT_BATCH_SIZE,
+                        help="Subscriptions handled per pass")
+    args = parser.parse_args()
+
+    run(args.once, args.interval, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Purge expired and fully viewed secrets in bounded batches.
+
+Each batch is one DELETE ... WHERE id IN (SELECT ... LIMIT n FOR UPDATE SKIP
+LOCKED) in its own short transaction. Expired rows are found through
+ix_secrets_expires_at and used-up rows through ix_secrets_exhausted_updated_at.
+Their access_logs go with them via the foreign key's ON DELETE CASCADE, and
+attachment blobs are deleted once the batch has committed. Each pass also
+runs access_logs partition maintenance.
+
+Usage: python -m app.jobs.sweep_expired [--once] [--interval S] [--batch-size N] [--max-rows-per-second N]
+"""
+import argparse
+import time
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, delete, func, select
+
+from app.core.config import settings
+from app.core.storage import blob_store
+from app.db.base import engine
+from app.jobs import access_log_partitions
+from app.models.secret import Secret
+
+
+def sweep_targets() -> List[Tuple[str, object, object, timedelta]]:
+    """(name, column the batch is ordered by, condition, grace after that column)"""
+    grace = timedelta(minutes=settings.ATTACHMENT_LINK_EXPIRE_MINUTES)
+    return [
+        ("expired", Secret.expires_at, Secret.expires_at <= func.now(), timedelta()),
+        (
+            "viewed",
+            Secret.updated_at,
+            and_(Secret.current_views >= Secret.max_views, Secret.updated_at <= func.now() - grace),
+            grace,
+        ),
+    ]
+
+
+def delete_batch(order_by, condition, batch_size: int) -> Tuple[int, List[str]]:
+    """Delete up to batch_size matching secrets; returns the count and their blob keys"""
+    doomed = (
+        select(Secret.id)
+        .where(condition)
+        .order_by(order_by)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = delete(Secret).where(Secret.id.in_(doomed)).returning(Secret.attachment_url)
+
+    with engine.begin() as conn:
+        blob_keys = list(conn.execute(stmt).scalars())
+
+    return len(blob_keys), [key for key in blob_keys if key]
+
+
+def delete_blobs(blob_keys: List[str]) -> None:
+    for key in blob_keys:
+        try:
+            blob_store.delete(key)
+        except Exception as e:
+            # The row is already gone, so this blob is orphaned until removed by hand
+            print(f"Failed to delete attachment blob {key}: {e}")
+
+
+def lag_seconds() -> Dict[str, float]:
+    """How far each sweep is behind the clock: age of its oldest purgeable row"""
+    lag = {}
+    with engine.connect() as conn:
+        for name, order_by, condition, grace in sweep_targets():
+            oldest, now = conn.execute(select(func.min(order_by), func.now()).where(condition)).one()
+            lag[name] = (now - oldest - grace).total_seconds() if oldest else 0.0
+    return lag
+
+
+def sweep(batch_size: int, max_rows_per_second: int) -> Dict[str, int]:
+    """Purge everything currently due, batch by batch, without exceeding the row rate"""
+    purged = {}
+    for name, order_by, condition, _ in sweep_targets():
+        purged[name] = 0
+        while True:
+            started = time.monotonic()
+            deleted, blob_keys = delete_batch(order_by, condition, batch_size)
+            delete_blobs(blob_keys)
+            purged[name] += deleted
+
+            if deleted < batch_size:
+                break
+
+            if max_rows_per_second:
+                time.sleep(max(0.0, deleted / max_rows_per_second - (time.monotonic() - started)))
+
+    return purged
+
+
+def run(once: bool, interval: int, batch_size: int, max_rows_per_second: int) -> None:
+    while True:
+        access_log_partitions.maintain()
+
+        started = time.monotonic()
+        purged = sweep(batch_size, max_rows_per_second)
+        lag = lag_seconds()
+        print(
+            f"Purged {purged['expired']} expired and {purged['viewed']} viewed secrets "
+            f"in {time.monotonic() - started:.1f}s, lag {lag['expired']:.0f}s / {lag['viewed']:.0f}s"
+        )
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="Sweep once and exit (for cron)")
+    parser.add_argument("--interval", type=int, default=settings.SWEEPER_INTERVAL_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=settings.SWEEPER_BATCH_SIZE)
+    parser.add_argument("--max-rows-per-second", type=int, default=settings.SWEEPER_MAX_ROWS_PER_SECOND)
+    args = parser.parse_args()
+
+    run(args.once, args.interval, args.batch_size, args.max_rows_per_second)
+
+
+if __name__ == "__main__":
+    main()
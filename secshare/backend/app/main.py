@@ -1,6 +1,17 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.core.circuit_breaker import CircuitOpen
 from app.core.config import settings
+from app.core.executor import ExecutorSaturated
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.payments import stripe_executor, stripe_stats
+from app.core.rate_limit import RateLimited
+from app.core.redis import async_redis_client
+from app.core.security import password_executor
+from app.db.access_logs import access_log_buffer
+from app.db.base import db_pool_stats
+from app.api.deps import principal_cache, rate_limiter, require_metrics_token, response_cache
 from app.api.v1.router import api_router
 
 app = FastAPI(
@@ -15,11 +26,74 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(CircuitOpen)
+async def circuit_open_handler(request: Request, exc: CircuitOpen):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": f"{exc.name.capitalize()} is unavailable, please retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many requests, please retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("startup")
+async def start_access_log_buffer():
+    if settings.ACCESS_LOG_WRITE_BEHIND:
+        access_log_buffer.start()
+
+
+@app.on_event("shutdown")
+async def drain_access_log_buffer():
+    await access_log_buffer.stop()
+
+
+@app.on_event("shutdown")
+async def close_redis():
+    await async_redis_client.aclose()
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    password_executor.shutdown()
+    stripe_executor.shutdown()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+async def metrics():
+    return {
+        "password_hashing": password_executor.stats(),
+        "principal_cache": principal_cache.stats(),
+        "db_pool": db_pool_stats(),
+        "access_log_buffer": access_log_buffer.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "response_cache": response_cache.stats(),
+        "stripe": stripe_stats(),
+    }
@@ -4,5 +4,8 @@ from app.models.subscription import Subscription
 from app.models.secret import Secret
 from app.models.access_log import AccessLog
 from app.models.usage_stats import UsageStats
+from app.models.access_stats import SecretAccessHourly, SecretAccessIP, SecretAccessAgent
+from app.models.stripe_event import StripeEvent
 
-__all__ = ["User", "Team", "Subscription", "Secret", "AccessLog", "UsageStats"]
+__all__ = ["User", "Team", "Subscription", "Secret", "AccessLog", "UsageStats",
+           "SecretAccessHourly", "SecretAccessIP", "SecretAccessAgent", "StripeEvent"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -6,13 +6,20 @@ from app.db.base import Base
 
 class AccessLog(Base):
     __tablename__ = "access_logs"
+    # Monthly partitions are created and dropped by app.jobs.access_log_partitions
+    __table_args__ = (
+        # Keyset pagination of a secret's log, most recent first
+        Index("ix_access_logs_secret_id_accessed_at", "secret_id", text("accessed_at DESC"), text("id DESC")),
+        {"postgresql_partition_by": "RANGE (accessed_at)"},
+    )
 
     id = Column(String, primary_key=True)
-    secret_id = Column(String, ForeignKey("secrets.id", ondelete="CASCADE"), nullable=False, index=True)
+    secret_id = Column(String, ForeignKey("secrets.id", ondelete="CASCADE"), nullable=False)
 
     ip_address = Column(String, nullable=False)
     user_agent = Column(String, nullable=True)
-    accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key, so it has to be part of the primary key
+    accessed_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True, index=True)
 
     # Relationships
     secret = relationship("Secret", back_populates="access_logs")
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from app.db.base import Base
+
+
+# Rollups of access_logs, maintained by the same statements that write the
+# log rows (see app.db.access_stats) so stats never have to scan access_logs
+
+class SecretAccessHourly(Base):
+    __tablename__ = "secret_access_hourly"
+
+    secret_id = Column(String, ForeignKey("secrets.id", ondelete="CASCADE"), primary_key=True)
+    # Start of the UTC hour
+    hour = Column(DateTime(timezone=True), primary_key=True, index=True)
+    views = Column(Integer, default=0, nullable=False)
+
+
+class SecretAccessIP(Base):
+    __tablename__ = "secret_access_ips"
+
+    secret_id = Column(String, ForeignKey("secrets.id", ondelete="CASCADE"), primary_key=True)
+    ip_address = Column(String, primary_key=True)
+    views = Column(Integer, default=0, nullable=False)
+    last_accessed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class SecretAccessAgent(Base):
+    __tablename__ = "secret_access_agents"
+
+    secret_id = Column(String, ForeignKey("secrets.id", ondelete="CASCADE"), primary_key=True)
+    # Empty string when the client sent no User-Agent
+    user_agent = Column(String, primary_key=True)
+    views = Column(Integer, default=0, nullable=False)
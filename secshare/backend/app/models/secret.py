@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, BigInteger, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, BigInteger, LargeBinary, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -6,11 +6,18 @@ from app.db.base import Base
 
 class Secret(Base):
     __tablename__ = "secrets"
+    __table_args__ = (
+        # Used-up secrets waiting for the expiry sweeper, by time of last view
+        Index("ix_secrets_exhausted_updated_at", "updated_at", postgresql_where=text("current_views >= max_views")),
+        # Keyset pagination of a user's secrets, newest first
+        Index("ix_secrets_created_by_id_created_at", "created_by_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(String, primary_key=True)
-    encrypted_content = Column(Text, nullable=False)
-    encrypted_key = Column(String, nullable=False)
-    iv = Column(String, nullable=False)
+    encrypted_content_bin = Column(LargeBinary, nullable=False)
+    encrypted_key_bin = Column(LargeBinary, nullable=False)
+    key_version = Column(Integer, default=1, server_default="1", nullable=False)
+    iv_bin = Column(LargeBinary, nullable=False)
 
     max_views = Column(Integer, default=1, nullable=False)
     current_views = Column(Integer, default=0, nullable=False)
@@ -20,8 +27,12 @@ class Secret(Base):
     attachment_url = Column(String, nullable=True)
     attachment_name = Column(String, nullable=True)
     attachment_size = Column(BigInteger, nullable=True)
+    # Master key version in the blob's header. The header is authenticated
+    # with every chunk, so it can't be re-wrapped; the version has to stay in
+    # MASTER_KEYS until the attachment is gone. NULL for older uploads.
+    attachment_key_version = Column(Integer, nullable=True)
 
-    created_by_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    created_by_id = Column(String, ForeignKey("users.id"), nullable=False)
     team_id = Column(String, ForeignKey("teams.id"), nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -30,4 +41,17 @@ class Secret(Base):
     # Relationships
     created_by = relationship("User", back_populates="secrets")
     team = relationship("Team", back_populates="secrets")
-    access_logs = relationship("AccessLog", back_populates="secret", cascade="all, delete-orphan")
+    # Logs are removed by the FK's ON DELETE CASCADE instead of being loaded first
+    access_logs = relationship("AccessLog", back_populates="secret", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def ciphertext(self) -> bytes:
+        return bytes(self.encrypted_content_bin)
+
+    @property
+    def wrapped_key(self) -> bytes:
+        return bytes(self.encrypted_key_bin)
+
+    @property
+    def content_iv(self) -> bytes:
+        return bytes(self.iv_bin)
@@ -0,0 +1,38 @@
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, Text, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class StripeEvent(Base):
+    """Inbox of verified Stripe webhook deliveries, applied by app.jobs.stripe_events"""
+    __tablename__ = "stripe_events"
+    __table_args__ = (
+        Index(
+            "ix_stripe_events_pending_created", "created",
+            postgresql_where=text("processed_at IS NULL AND failed_at IS NULL")
+        ),
+        Index("ix_stripe_events_subscription_key_created", "subscription_key", "created"),
+    )
+
+    # Stripe's event id, so redelivered events are only stored once
+    id = Column(String, primary_key=True)
+    type = Column(String, nullable=False)
+    # Stripe subscription the event is about; events are applied in order per key
+    subscription_key = Column(String, nullable=False)
+    created = Column(DateTime(timezone=True), nullable=False)
+    # The event's data.object
+    payload = Column(JSONB, nullable=False)
+
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Set once applied or skipped as superseded
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    # Whether applying it changed a subscription; only such events supersede older ones
+    applied = Column(Boolean, default=False, server_default=text("false"), nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    last_error = Column(Text, nullable=True)
+    # After a failed attempt, the event isn't retried before this
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    # Set instead of processed_at when STRIPE_EVENT_MAX_ATTEMPTS ran out;
+    # parked events are kept for inspection and never purged
+    failed_at = Column(DateTime(timezone=True), nullable=True)
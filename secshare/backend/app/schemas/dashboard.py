@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.schemas.secret import SecretResponse
+from app.schemas.subscription import SubscriptionResponse, UsageResponse
+from app.schemas.user import UserResponse
+
+
+class DashboardResponse(BaseModel):
+    user: UserResponse
+    subscription: Optional[SubscriptionResponse] = None
+    usage: UsageResponse
+    secrets: List[SecretResponse]
+    # Pass to GET /secrets?cursor= for the rest of the list
+    next_cursor: Optional[str] = None
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+import enum
 
 
 class SecretCreate(BaseModel):
@@ -9,6 +10,10 @@ class SecretCreate(BaseModel):
     expires_in_hours: int = 24
 
 
+class SecretBatchCreate(BaseModel):
+    items: List[SecretCreate] = Field(..., min_length=1)
+
+
 class SecretResponse(BaseModel):
     id: str
     max_views: int
@@ -31,3 +36,31 @@ class SecretView(BaseModel):
     has_attachment: bool
     attachment_url: Optional[str] = None
     attachment_name: Optional[str] = None
+
+
+class SecretDeleteScope(str, enum.Enum):
+    EXPIRED = "expired"
+    ALL = "all"
+    TEAM = "team"
+
+
+class SecretDeleteResult(BaseModel):
+    deleted: int
+
+
+class AccessStatsBucket(BaseModel):
+    start: datetime
+    views: int
+
+
+class UserAgentViews(BaseModel):
+    user_agent: str
+    views: int
+
+
+class AccessStats(BaseModel):
+    total_views: int
+    unique_ips: int
+    hourly: List[AccessStatsBucket]
+    daily: List[AccessStatsBucket]
+    top_user_agents: List[UserAgentViews]
@@ -29,6 +29,8 @@ class UserResponse(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    # Only set when login is asked for it with ?include_user=true
+    user: Optional[UserResponse] = None
 
 
 class TokenData(BaseModel):
@@ -0,0 +1,53 @@
+"""Per-request crypto cost of create_secret / get_secret.
+
+Compares deriving the master key on every call (the previous behaviour)
+against the process-wide keyring.
+
+Usage: python -m scripts.bench_crypto [iterations]
+"""
+import os
+import sys
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.core.config import settings
+from app.core.security import SecretEncryption, derive_master_key
+
+
+def per_request_kdf(content: str) -> None:
+    key = SecretEncryption.generate_key()
+    iv = SecretEncryption.generate_iv()
+    ciphertext = SecretEncryption.encrypt(content, key, iv)
+
+    wrap_iv = os.urandom(12)
+    wrapped = wrap_iv + AESGCM(derive_master_key(settings.SECRET_KEY)).encrypt(wrap_iv, key, None)
+
+    unwrapped = AESGCM(derive_master_key(settings.SECRET_KEY)).decrypt(wrapped[:12], wrapped[12:], None)
+    SecretEncryption.decrypt(ciphertext, unwrapped, iv)
+
+
+def keyring(content: str) -> None:
+    key = SecretEncryption.generate_key()
+    iv = SecretEncryption.generate_iv()
+    ciphertext = SecretEncryption.encrypt(content, key, iv)
+
+    wrapped, version = SecretEncryption.encrypt_key(key)
+
+    unwrapped = SecretEncryption.decrypt_key(wrapped, version)
+    SecretEncryption.decrypt(ciphertext, unwrapped, iv)
+
+
+def run(name, fn, iterations: int) -> None:
+    content = "x" * 256
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(content)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {iterations:>6} create+view  {elapsed / iterations * 1e6:>10.1f} us/op")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    run("per-request KDF", per_request_kdf, max(1, iterations // 20))
+    run("keyring", keyring, iterations)
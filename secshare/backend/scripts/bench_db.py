@@ -0,0 +1,69 @@
+"""Sync vs async database throughput at high concurrency.
+
+Runs the get_secret lookup (SELECT a secret by id) with C concurrent callers
+against the same database: the sync engine through a threadpool sized like
+Starlette's (40 threads), and the async engine from a single event loop.
+Both engines use the same pool settings.
+
+Usage: python -m scripts.bench_db [concurrency] [requests]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+from app.db.base import AsyncSessionLocal, SessionLocal
+from app.models.secret import Secret
+
+THREADPOOL_SIZE = 40
+
+
+def sync_lookup(secret_id: str) -> None:
+    with SessionLocal() as db:
+        db.execute(select(Secret).where(Secret.id == secret_id)).first()
+
+
+async def async_lookup(secret_id: str) -> None:
+    async with AsyncSessionLocal() as db:
+        (await db.execute(select(Secret).where(Secret.id == secret_id))).first()
+
+
+def run_sync(ids, concurrency: int) -> float:
+    # Requests beyond the threadpool size just wait for a free thread
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(concurrency, THREADPOOL_SIZE)) as pool:
+        list(pool.map(sync_lookup, ids))
+    return time.perf_counter() - started
+
+
+async def run_async(ids, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(secret_id: str) -> None:
+        async with semaphore:
+            await async_lookup(secret_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(secret_id) for secret_id in ids))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with SessionLocal() as db:
+        existing = [row.id for row in db.execute(select(Secret.id).limit(1000))]
+    ids = [existing[i % len(existing)] if existing else f"missing-{i}" for i in range(requests)]
+
+    elapsed = run_sync(ids, concurrency)
+    print(f"sync   c={concurrency:<5} {requests / elapsed:8.0f} req/s")
+
+    elapsed = asyncio.run(run_async(ids, concurrency))
+    print(f"async  c={concurrency:<5} {requests / elapsed:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
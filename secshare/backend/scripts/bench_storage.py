@@ -0,0 +1,81 @@
+"""Storage size and view-path latency of base64 text vs binary ciphertext.
+
+Builds two scratch tables with the same N fixture secrets, one per storage
+format, reports their total relation size, then times fetch-by-id plus
+unwrap/decrypt for a sample of ids. The scratch tables are dropped at the end.
+
+Usage: python -m scripts.bench_storage [rows] [content_bytes]
+"""
+import base64
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.core.security import SecretEncryption
+from app.db.base import engine
+
+FORMATS = {
+    "base64": "encrypted_content text, encrypted_key varchar, iv varchar",
+    "binary": "encrypted_content bytea, encrypted_key bytea, iv bytea",
+}
+
+
+def fixture_rows(rows: int, content_bytes: int):
+    for i in range(rows):
+        key = SecretEncryption.generate_key()
+        iv = SecretEncryption.generate_iv()
+        content = SecretEncryption.encrypt(os.urandom(content_bytes // 2).hex(), key, iv)
+        wrapped, _ = SecretEncryption.encrypt_key(key)
+        yield f"s{i:08d}", content, wrapped, iv
+
+
+def encode(fmt: str, value: bytes):
+    return base64.b64encode(value).decode() if fmt == "base64" else value
+
+
+def decode(fmt: str, value):
+    return base64.b64decode(value) if fmt == "base64" else bytes(value)
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    content_bytes = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    fixtures = list(fixture_rows(rows, content_bytes))
+    sample = random.sample([row[0] for row in fixtures], min(2000, rows))
+
+    with engine.connect() as conn:
+        for fmt, columns in FORMATS.items():
+            table = f"bench_secrets_{fmt}"
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(f"CREATE TABLE {table} (id varchar PRIMARY KEY, {columns})"))
+            conn.execute(
+                text(f"INSERT INTO {table} VALUES (:id, :content, :key, :iv)"),
+                [
+                    {"id": i, "content": encode(fmt, c), "key": encode(fmt, k), "iv": encode(fmt, v)}
+                    for i, c, k, v in fixtures
+                ],
+            )
+            conn.commit()
+
+            size = conn.execute(text(f"SELECT pg_total_relation_size('{table}')")).scalar_one()
+
+            query = text(f"SELECT encrypted_content, encrypted_key, iv FROM {table} WHERE id = :id")
+            started = time.perf_counter()
+            for secret_id in sample:
+                content, wrapped, iv = conn.execute(query, {"id": secret_id}).one()
+                key = SecretEncryption.decrypt_key(decode(fmt, wrapped))
+                SecretEncryption.decrypt(decode(fmt, content), key, decode(fmt, iv))
+            elapsed = time.perf_counter() - started
+
+            print(f"{fmt:<7} {rows} rows  {size / 1024 / 1024:8.1f} MiB  "
+                  f"view {elapsed / len(sample) * 1e6:8.1f} us/op")
+
+            conn.execute(text(f"DROP TABLE {table}"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Shared fixtures.
+
+The tests run the app against the Postgres and Redis in DATABASE_URL and
+REDIS_URL, e.g.:
+
+    docker compose up -d postgres redis
+    alembic upgrade head
+    pytest
+
+Tests that need the database are skipped when it isn't reachable. Every
+test works with its own users and secrets, so a dev database can be reused.
+"""
+import secrets
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from app.db.base import engine
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as exc:
+        pytest.skip(f"Database not available: {exc}")
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(engine):
+    from app.main import app
+
+    # One client for the session: the async engine's pool is bound to the
+    # client's event loop
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(client):
+    email = f"{secrets.token_hex(8)}@example.com"
+    client.post("/api/v1/auth/register", json={"email": email, "password": "password"})
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.executor import BoundedExecutor, ExecutorSaturated
+
+
+async def cancel_after_start(executor, fn):
+    task = asyncio.create_task(executor.run(fn))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_cancelled_caller_keeps_slot_until_job_ends():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+    release = threading.Event()
+    finished = threading.Event()
+
+    def job():
+        release.wait(5)
+        finished.set()
+
+    async def scenario():
+        await cancel_after_start(executor, job)
+
+        # The job is still running on the pool, so it still counts
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: None)
+
+        release.set()
+        finished.wait(5)
+        await asyncio.sleep(0.05)
+        assert executor.stats()["in_flight"] == 0
+        assert executor.stats()["completed"] == 1
+        assert await executor.run(lambda: "ok") == "ok"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_cancelled_queued_job_frees_its_slot_without_completing():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        await cancel_after_start(executor, lambda: None)
+
+        assert executor.stats()["in_flight"] == 1
+        release.set()
+        assert await running is True
+        assert executor.stats()["in_flight"] == 0
+        assert executor.stats()["completed"] == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
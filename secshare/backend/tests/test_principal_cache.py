@@ -0,0 +1,49 @@
+import pytest
+
+from app.api import deps
+from app.core.redis import redis_client
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """User ids get_current_principal loaded from the database"""
+    loads = []
+    load_principal = deps.load_principal
+
+    async def counting_load(db, user_id, claims):
+        loads.append(user_id)
+        return await load_principal(db, user_id, claims)
+
+    monkeypatch.setattr(deps, "load_principal", counting_load)
+    return loads
+
+
+def me(client, headers):
+    return client.get("/api/v1/auth/me", headers=headers).json()["id"]
+
+
+def test_invalidation_from_another_process_reloads_principal(client, auth_headers, loads):
+    user_id = me(client, auth_headers)
+    me(client, auth_headers)
+    assert len(loads) == 1
+
+    # What a job's invalidate_principal leaves behind: only the Redis generation moves
+    deps.bump_principal_generation(redis_client, user_id)
+
+    me(client, auth_headers)
+    me(client, auth_headers)
+    assert len(loads) == 2
+
+
+def test_invalidation_after_generation_expired_reloads_principal(client, auth_headers, loads):
+    user_id = me(client, auth_headers)
+    deps.bump_principal_generation(redis_client, user_id)
+    me(client, auth_headers)
+    assert len(loads) == 2
+
+    # The generation expires while the entry is still cached, then the user changes again
+    redis_client.delete(deps.principal_generation_key(user_id))
+    deps.bump_principal_generation(redis_client, user_id)
+
+    me(client, auth_headers)
+    assert len(loads) == 3
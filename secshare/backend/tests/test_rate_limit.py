@@ -0,0 +1,39 @@
+import secrets
+
+import pytest
+
+from app.api import deps
+from app.core.config import settings
+from app.core.rate_limit import Bucket
+
+
+@pytest.fixture
+def per_ip_limit(monkeypatch):
+    """Two secret views per IP, behind one proxy"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_COUNT", 1)
+    monkeypatch.setattr(deps.rate_limiter, "rules", {"secret_view": {"per_ip": Bucket.parse("2/3600")}})
+
+
+def random_ip():
+    # Fresh addresses per run, since buckets live in the shared Redis
+    return f"2001:db8::{secrets.token_hex(2)}:{secrets.token_hex(2)}"
+
+
+def view(client, forwarded_for):
+    return client.get("/api/v1/secrets/does-not-exist", headers={"X-Forwarded-For": forwarded_for}).status_code
+
+
+def test_forwarded_ips_get_separate_buckets(client, per_ip_limit):
+    first, second = random_ip(), random_ip()
+
+    assert [view(client, first) for _ in range(3)] == [404, 404, 429]
+    assert view(client, second) == 404
+
+
+def test_client_controlled_hops_are_ignored(client, per_ip_limit):
+    ip = random_ip()
+
+    assert view(client, f"10.0.0.1, {ip}") == 404
+    assert view(client, f"10.0.0.2, {ip}") == 404
+    assert view(client, f"10.0.0.3, {ip}") == 429
@@ -0,0 +1,31 @@
+import asyncio
+
+import fakeredis
+
+from app.core.response_cache import ResponseCache
+
+
+def make_cache():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    async_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return ResponseCache(client, async_client, ttl_seconds=60), client
+
+
+def test_invalidate_async_drops_entries_and_bumps_generation():
+    cache, client = make_cache()
+    entries, generation = cache.keys("user")
+    client.hset(entries, "auth_me", '"etag" {}')
+
+    asyncio.run(cache.invalidate_async("user"))
+
+    assert not client.exists(entries)
+    assert client.get(generation) == "1"
+
+
+def test_invalidate_async_matches_invalidate():
+    cache, client = make_cache()
+    cache.invalidate("user")
+    asyncio.run(cache.invalidate_async("user"))
+
+    assert client.get(cache.keys("user")[1]) == "2"
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+
+def create_secret(client, headers, **fields):
+    response = client.post("/api/v1/secrets", json={"content": "s3cret", **fields}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def test_parallel_views_never_exceed_max_views(client, auth_headers):
+    secret_id = create_secret(client, auth_headers, max_views=5)
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(lambda _: client.get(f"/api/v1/secrets/{secret_id}").status_code, range(20)))
+
+    assert statuses.count(200) == 5
+    assert statuses.count(410) == 15
+
+
+def test_used_up_secret_is_gone_but_left_to_the_sweeper(client, auth_headers, engine):
+    secret_id = create_secret(client, auth_headers, max_views=1)
+
+    first = client.get(f"/api/v1/secrets/{secret_id}")
+    assert first.status_code == 200
+    assert first.json()["content"] == "s3cret"
+
+    second = client.get(f"/api/v1/secrets/{secret_id}")
+    assert second.status_code == 410
+    assert second.json()["detail"] == "Secret has been viewed maximum times"
+
+    with engine.connect() as conn:
+        views = conn.execute(
+            text("SELECT current_views FROM secrets WHERE id = :id"), {"id": secret_id}
+        ).scalar_one()
+    assert views == 1
+
+
+def test_expired_secret(client, auth_headers, engine):
+    secret_id = create_secret(client, auth_headers, max_views=3)
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE secrets SET expires_at = now() - interval '1 minute' WHERE id = :id"),
+            {"id": secret_id}
+        )
+
+    response = client.get(f"/api/v1/secrets/{secret_id}")
+    assert response.status_code == 410
+    assert response.json()["detail"] == "Secret has expired"
+
+
+def test_unknown_secret(client):
+    assert client.get("/api/v1/secrets/does-not-exist").status_code == 404
@@ -0,0 +1,156 @@
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.jobs import stripe_events
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+@pytest.fixture
+def webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET)
+
+
+@pytest.fixture
+def subscription_key(client, auth_headers, engine):
+    """Stripe subscription id linked to a fresh user's subscription"""
+    key = f"sub_{secrets.token_hex(8)}"
+    user_id = client.get("/api/v1/auth/me", headers=auth_headers).json()["id"]
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE subscriptions SET stripe_subscription_id = :key, status = 'ACTIVE' WHERE user_id = :user_id"),
+            {"key": key, "user_id": user_id}
+        )
+    return key
+
+
+def stripe_event(event_type, key, created):
+    return {
+        "id": f"evt_{secrets.token_hex(8)}",
+        "type": event_type,
+        "created": int(created.timestamp()),
+        "data": {"object": {"id": key, "items": {"data": [{"price": {"id": "price_unknown"}}]}}},
+    }
+
+
+def deliver(client, event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    response = client.post(
+        "/api/v1/subscriptions/webhook",
+        content=payload,
+        headers={"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+    )
+    assert response.status_code == 200, response.text
+
+
+def rows(engine, key):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT type, processed_at, failed_at, attempts, next_attempt_at
+            FROM stripe_events WHERE subscription_key = :key ORDER BY created
+        """), {"key": key}).all()
+
+
+def subscription_status(engine, key):
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT status FROM subscriptions WHERE stripe_subscription_id = :key"), {"key": key}
+        ).scalar_one()
+
+
+def test_redelivered_event_is_stored_and_applied_once(client, engine, webhook_secret, subscription_key):
+    event = stripe_event("customer.subscription.deleted", subscription_key, datetime.now(timezone.utc))
+    deliver(client, event)
+    deliver(client, event)
+
+    assert len(rows(engine, subscription_key)) == 1
+    assert stripe_events.process_subscription(subscription_key)[:2] == (1, 0)
+    assert subscription_status(engine, subscription_key) == "CANCELED"
+
+
+def test_older_event_arriving_late_is_skipped(client, engine, webhook_secret, subscription_key):
+    now = datetime.now(timezone.utc)
+    deliver(client, stripe_event("customer.subscription.deleted", subscription_key, now))
+    stripe_events.process_subscription(subscription_key)
+
+    # An update Stripe sent before the cancellation, delivered after it
+    deliver(client, stripe_event("customer.subscription.updated", subscription_key, now - timedelta(minutes=1)))
+    applied, failed, _ = stripe_events.process_subscription(subscription_key)
+
+    assert (applied, failed) == (0, 0)
+    assert subscription_status(engine, subscription_key) == "CANCELED"
+    assert all(row.processed_at is not None for row in rows(engine, subscription_key))
+
+
+def test_late_checkout_is_applied_after_a_newer_no_op_event(client, auth_headers, engine, webhook_secret, monkeypatch):
+    user_id = client.get("/api/v1/auth/me", headers=auth_headers).json()["id"]
+    key = f"sub_{secrets.token_hex(8)}"
+    monkeypatch.setattr(
+        stripe_events.stripe.Subscription, "retrieve",
+        lambda sub_id: {"items": {"data": [{"price": {"id": "price_unknown"}}]}}
+    )
+
+    # The update overtakes the checkout that links the subscription, so it changes nothing
+    now = datetime.now(timezone.utc)
+    deliver(client, stripe_event("customer.subscription.updated", key, now))
+    assert stripe_events.process_subscription(key)[:2] == (1, 0)
+
+    checkout = stripe_event("checkout.session.completed", key, now - timedelta(seconds=5))
+    checkout["data"]["object"] = {"id": "cs_test", "subscription": key, "metadata": {"user_id": user_id}}
+    deliver(client, checkout)
+    assert stripe_events.process_subscription(key)[:2] == (1, 0)
+
+    with engine.connect() as conn:
+        linked = conn.execute(
+            text("SELECT stripe_subscription_id, status FROM subscriptions WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        ).one()
+    assert tuple(linked) == (key, "ACTIVE")
+
+
+def test_failing_event_backs_off_then_is_parked(client, engine, webhook_secret, subscription_key, monkeypatch):
+    monkeypatch.setattr(settings, "STRIPE_EVENT_MAX_ATTEMPTS", 2)
+    apply_event = stripe_events.apply_event
+
+    def fail_updates(db, event):
+        if event.type == "customer.subscription.updated":
+            raise RuntimeError("boom")
+        return apply_event(db, event)
+
+    monkeypatch.setattr(stripe_events, "apply_event", fail_updates)
+
+    now = datetime.now(timezone.utc)
+    deliver(client, stripe_event("customer.subscription.updated", subscription_key, now - timedelta(minutes=1)))
+    deliver(client, stripe_event("customer.subscription.deleted", subscription_key, now))
+
+    # First failure holds back the newer event and schedules a retry
+    assert stripe_events.process_subscription(subscription_key)[:2] == (0, 1)
+    failing, newer = rows(engine, subscription_key)
+    assert failing.attempts == 1 and failing.next_attempt_at > now
+    assert newer.processed_at is None
+    assert subscription_key not in stripe_events.pending_subscriptions(10000)
+    assert stripe_events.process_subscription(subscription_key)[:2] == (0, 0)
+
+    # Once due, the last attempt fails too: parked, not processed
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE stripe_events SET next_attempt_at = now() WHERE subscription_key = :key"),
+            {"key": subscription_key}
+        )
+    assert stripe_events.process_subscription(subscription_key)[:2] == (1, 1)
+
+    failing, newer = rows(engine, subscription_key)
+    assert failing.attempts == 2
+    assert failing.failed_at is not None and failing.processed_at is None
+    assert newer.processed_at is not None
+    assert subscription_status(engine, subscription_key) == "CANCELED"
@@ -0,0 +1,102 @@
+import secrets
+
+import fakeredis
+import pytest
+from sqlalchemy import text
+
+from app.db import usage
+from app.db.usage import INCREMENT_SCRIPT, SEED_SCRIPT, current_period, dirty_key, usage_key
+from app.jobs import reconcile_usage
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(usage, "redis_client", fake)
+    monkeypatch.setattr(usage, "increment_script", fake.register_script(INCREMENT_SCRIPT))
+    monkeypatch.setattr(usage, "seed_script", fake.register_script(SEED_SCRIPT))
+    monkeypatch.setattr(reconcile_usage, "redis_client", fake)
+    return fake
+
+
+@pytest.fixture
+def user_id(engine):
+    """A user whose usage_stats row already counts 3 secrets this month"""
+    user_id = secrets.token_urlsafe(16)
+    start, end = current_period()
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, email, password_hash) VALUES (:id, :email, 'x')"),
+            {"id": user_id, "email": f"{user_id}@example.com"}
+        )
+        conn.execute(text("""
+            INSERT INTO usage_stats (id, user_id, secrets_created_this_month, secret_requests_this_month,
+                                     attachment_bytes_this_month, period_start, period_end)
+            VALUES (:id, :user_id, 3, 0, 0, :start, :end)
+        """), {"id": user_id, "user_id": user_id, "start": start, "end": end})
+    return user_id
+
+
+@pytest.fixture
+def db(engine):
+    from app.db.base import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def stored_counts(engine, user_id):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT secrets_created_this_month, secret_requests_this_month, attachment_bytes_this_month
+            FROM usage_stats WHERE user_id = :user_id
+        """), {"user_id": user_id}).one()
+
+
+def test_increment_seeds_from_usage_stats_on_first_touch(fake_redis, db, user_id):
+    usage.increment_usage(db, user_id, secrets_created_this_month=1)
+    usage.increment_usage(db, user_id, secrets_created_this_month=1, attachment_bytes_this_month=100)
+
+    start, _ = current_period()
+    assert usage.get_usage_counts(db, user_id) == {
+        "secrets_created_this_month": 5,
+        "secret_requests_this_month": 0,
+        "attachment_bytes_this_month": 100,
+    }
+    assert fake_redis.sismember(dirty_key(start), user_id)
+
+
+def test_read_seeds_missing_counters(fake_redis, db, user_id):
+    start, _ = current_period()
+    assert usage.get_usage_counts(db, user_id)["secrets_created_this_month"] == 3
+    assert fake_redis.hget(usage_key(user_id, start), "seeded") == "1"
+
+
+def test_reconcile_writes_dirty_counters_back(fake_redis, db, engine, user_id):
+    usage.increment_usage(db, user_id, secret_requests_this_month=2)
+
+    reconcile_usage.reconcile(batch_size=10)
+
+    assert tuple(stored_counts(engine, user_id)) == (3, 2, 0)
+    start, _ = current_period()
+    assert not fake_redis.sismember(dirty_key(start), user_id)
+
+
+def test_reconcile_keeps_unseeded_users_dirty(fake_redis, engine, user_id):
+    start, _ = current_period()
+    fake_redis.hincrby(usage_key(user_id, start), "secrets_created_this_month", 1)
+    fake_redis.sadd(dirty_key(start), user_id)
+
+    reconcile_usage.reconcile(batch_size=10)
+
+    assert tuple(stored_counts(engine, user_id)) == (3, 0, 0)
+    assert fake_redis.sismember(dirty_key(start), user_id)
+
+
+def test_redis_down_reads_usage_stats(monkeypatch, db, user_id):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    monkeypatch.setattr(usage, "redis_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+
+    assert usage.get_usage_counts(db, user_id)["secrets_created_this_month"] == 3
@@ -1,7 +1,7 @@
 import axios from 'axios'
 import { useAuthStore } from '../store/auth'
 
-const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
+export const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
 const api = axios.create({
   baseURL: `${API_URL}/api/v1`,
@@ -29,4 +29,13 @@ api.interceptors.response.use(
   }
 )
 
+// The API returns some links (e.g. attachment downloads) relative to itself;
+// the app is served from another origin, so resolve them against the API
+export const apiUrl = (path: string) => new URL(path, API_URL).href
+
+// Paginated lists send the next page's cursor in X-Next-Cursor; pass it
+// back as ?cursor= to continue. null once the last page is reached.
+export const nextCursor = (headers: Record<string, any>): string | null =>
+  headers['x-next-cursor'] ?? null
+
 export default api
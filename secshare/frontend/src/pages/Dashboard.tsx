@@ -3,7 +3,7 @@ import { Link } from 'react-router-dom'
 import { format } from 'date-fns'
 import { Copy, Trash2, Eye, Plus } from 'lucide-react'
 import toast from 'react-hot-toast'
-import api from '../lib/api'
+import api, { nextCursor } from '../lib/api'
 
 interface Secret {
   id: string
@@ -17,7 +17,9 @@ interface Secret {
 export default function Dashboard() {
   const [secrets, setSecrets] = useState<Secret[]>([])
   const [usage, setUsage] = useState<any>(null)
+  const [cursor, setCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     fetchData()
@@ -25,12 +27,10 @@ export default function Dashboard() {
 
   const fetchData = async () => {
     try {
-      const [secretsRes, usageRes] = await Promise.all([
-        api.get('/secrets'),
-        api.get('/subscriptions/usage'),
-      ])
-      setSecrets(secretsRes.data)
-      setUsage(usageRes.data)
+      const { data } = await api.get('/dashboard')
+      setSecrets(data.secrets)
+      setCursor(data.next_cursor)
+      setUsage(data.usage)
     } catch (error) {
       toast.error('Failed to fetch data')
     } finally {
@@ -38,6 +38,20 @@ export default function Dashboard() {
     }
   }
 
+  // The dashboard only carries the first page; the rest comes from /secrets
+  const loadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const { data, headers } = await api.get('/secrets', { params: { cursor } })
+      setSecrets((current) => [...current, ...data])
+      setCursor(nextCursor(headers))
+    } catch (error) {
+      toast.error('Failed to fetch secrets')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const copyLink = (id: string) => {
     const url = `${window.location.origin}/s/${id}`
     navigator.clipboard.writeText(url)
@@ -177,6 +191,17 @@ export default function Dashboard() {
             </tbody>
           </table>
         </div>
+        {cursor && (
+          <div className="mt-4 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-4 py-2 border border-gray-300 rounded-md text-sm font-medium text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   )
@@ -17,11 +17,10 @@ export default function Login() {
     setLoading(true)
 
     try {
-      const { data: tokenData } = await api.post('/auth/login', { email, password })
-      setAuth(tokenData.access_token, null)
-
-      const { data: userData } = await api.get('/auth/me')
-      setAuth(tokenData.access_token, userData)
+      const { data } = await api.post('/auth/login', { email, password }, {
+        params: { include_user: true },
+      })
+      setAuth(data.access_token, data.user)
 
       toast.success('Logged in successfully')
       navigate('/')
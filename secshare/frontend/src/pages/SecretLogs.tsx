@@ -3,7 +3,7 @@ import { useParams, Link } from 'react-router-dom'
 import { format } from 'date-fns'
 import { ArrowLeft } from 'lucide-react'
 import toast from 'react-hot-toast'
-import api from '../lib/api'
+import api, { nextCursor } from '../lib/api'
 
 interface AccessLog {
   id: string
@@ -15,7 +15,9 @@ interface AccessLog {
 export default function SecretLogs() {
   const { secretId } = useParams<{ secretId: string }>()
   const [logs, setLogs] = useState<AccessLog[]>([])
+  const [cursor, setCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     fetchLogs()
@@ -23,8 +25,9 @@ export default function SecretLogs() {
 
   const fetchLogs = async () => {
     try {
-      const { data } = await api.get(`/secrets/${secretId}/logs`)
+      const { data, headers } = await api.get(`/secrets/${secretId}/logs`)
       setLogs(data)
+      setCursor(nextCursor(headers))
     } catch (error) {
       toast.error('Failed to fetch logs')
     } finally {
@@ -32,6 +35,21 @@ export default function SecretLogs() {
     }
   }
 
+  const loadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const { data, headers } = await api.get(`/secrets/${secretId}/logs`, {
+        params: { cursor },
+      })
+      setLogs((current) => [...current, ...data])
+      setCursor(nextCursor(headers))
+    } catch (error) {
+      toast.error('Failed to fetch logs')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   if (loading) {
     return <div className="text-center py-12">Loading...</div>
   }
@@ -96,6 +114,17 @@ export default function SecretLogs() {
             </tbody>
           </table>
         </div>
+        {cursor && (
+          <div className="mt-4 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-4 py-2 border border-gray-300 rounded-md text-sm font-medium text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   )
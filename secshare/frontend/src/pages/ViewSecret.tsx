@@ -2,7 +2,7 @@ import { useState } from 'react'
 import { useParams } from 'react-router-dom'
 import { Shield, Copy, CheckCircle } from 'lucide-react'
 import toast from 'react-hot-toast'
-import api from '../lib/api'
+import api, { apiUrl } from '../lib/api'
 
 export default function ViewSecret() {
   const { secretId } = useParams()
@@ -107,7 +107,7 @@ export default function ViewSecret() {
         {secret.has_attachment && (
           <div className="mt-4">
             <a
-              href={secret.attachment_url}
+              href={apiUrl(secret.attachment_url)}
               download={secret.attachment_name}
               className="inline-flex items-center px-4 py-2 border border-transparent rounded-md shadow-sm text-sm font-medium text-white bg-primary-600 hover:bg-primary-700"
             >